@@ -0,0 +1,7 @@
+"""Petits utilitaires partagés par les scripts de benchmark."""
+
+
+def percentile(values, q):
+    """Percentile `q` (0-100) par rang le plus proche ; 0.0 si aucune valeur"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
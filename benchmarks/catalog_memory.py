@@ -0,0 +1,119 @@
+"""
+Recipe catalog memory report: bytes per recipe of the default pandas load
+(every column, default dtypes) against the compact representation served by
+the app (`catalog.load_compact` + the typed `ingredients` column read from the
+list-columns file built at ingest), per column and in total, plus the resident-memory
+growth of each load measured in a fresh interpreter (Linux only). Exits with an error
+when resident memory does not shrink by TARGET_RATIO.
+
+Usage:
+    python benchmarks/catalog_memory.py [--csv data/processed_recipes_with_categories.csv.gz]
+"""
+import argparse
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+
+from helpers.catalog import bytes_per_recipe, load_compact, release_memory
+from helpers.list_columns import CATALOG_CSV, SERVED_COLUMNS, build_list_columns, encode_catalog, load_list_columns
+from helpers.recipes_db import ingredients_categories
+
+TARGET_RATIO = 5.0
+
+
+def rss_bytes():
+    """Mémoire résidente courante du processus (None hors Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def load(mode, csv_path, list_columns_path):
+    """Chargement de l'ancienne app (default) ou de l'app actuelle (compact, comme CatalogSnapshot)"""
+    if mode == "default":
+        return [pd.read_csv(csv_path)]
+    compact = load_compact(csv_path)
+    columns = load_list_columns(compact["id"], list_columns_path, names=SERVED_COLUMNS)
+    if columns is None:
+        columns = encode_catalog(pd.read_csv(csv_path, usecols=list(SERVED_COLUMNS)), names=SERVED_COLUMNS)
+        release_memory()
+    return [compact, columns]
+
+
+def measure_rss(mode, csv_path, list_columns_path):
+    """Croissance de la RSS due au chargement, mesurée dans un interpréteur neuf"""
+    output = subprocess.run(
+        [sys.executable, __file__, "--csv", csv_path, "--rss", mode, "--list-columns", list_columns_path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return int(output) if output.strip().lstrip("-").isdigit() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CATALOG_CSV)
+    parser.add_argument("--rss", choices=["default", "compact"], help=argparse.SUPPRESS)
+    parser.add_argument("--list-columns", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rss:
+        # Chargement à blanc sur quelques lignes : le code chargé au premier appel (parseur,
+        # imports paresseux) est un coût fixe, pas de la mémoire par recette
+        with tempfile.TemporaryDirectory() as workdir:
+            sample = os.path.join(workdir, "sample.csv")
+            pd.read_csv(args.csv, nrows=100).to_csv(sample, index=False)
+            load(args.rss, sample, args.list_columns)
+        gc.collect()
+        release_memory()
+        before = rss_bytes()
+        loaded = load(args.rss, args.csv, args.list_columns)  # noqa: F841  (gardé vivant pendant la mesure)
+        gc.collect()
+        after = rss_bytes()
+        print(after - before if before is not None else "")
+        return
+
+    # Colonnes typées écrites à l'ingestion (étape publish), hors mesure
+    workdir = tempfile.TemporaryDirectory()
+    list_columns_path = os.path.join(workdir.name, "list_columns.npz")
+    build_list_columns(args.csv, list_columns_path, categories=ingredients_categories)
+
+    default = pd.read_csv(args.csv)
+    compact, columns = load("compact", args.csv, list_columns_path)
+    n = len(compact)
+    typed = {name: columns[name].nbytes() for name in SERVED_COLUMNS}
+
+    per_column = pd.DataFrame({
+        "default": default.memory_usage(deep=True, index=False) / n,
+        "compact": compact.memory_usage(deep=True, index=False) / n,
+    })
+    for name, nbytes in typed.items():
+        per_column.loc[name, "compact"] = nbytes / n
+    print("Bytes per recipe, by column (compact '-' = dropped or fetched on demand):")
+    print(per_column.round(1).astype(object).where(per_column.notna(), "-").to_string())
+
+    before = bytes_per_recipe(default)
+    after = bytes_per_recipe(compact) + sum(typed.values()) / n
+    print(f"\n{n} recipes: {before:.0f} -> {after:.0f} bytes per recipe by pandas memory_usage "
+          f"({before / after:.1f}x, not counting allocator overhead)")
+
+    # L'objectif porte sur la mémoire résidente du processus, pas sur memory_usage
+    rss_default = measure_rss("default", args.csv, list_columns_path)
+    rss_compact = measure_rss("compact", args.csv, list_columns_path)
+    workdir.cleanup()
+    if not (rss_default and rss_compact):
+        sys.exit(f"resident memory could not be measured here; the {TARGET_RATIO:.0f}x target was not checked")
+    ratio = rss_default / rss_compact
+    print(f"Resident memory growth: {rss_default / n:.0f} -> {rss_compact / n:.0f} bytes per recipe "
+          f"({ratio:.1f}x, target {TARGET_RATIO:.0f}x)")
+    if ratio < TARGET_RATIO:
+        sys.exit(f"target not met: resident memory is only {ratio:.1f}x smaller (target {TARGET_RATIO:.0f}x)")
+
+if __name__ == "__main__":
+    main()
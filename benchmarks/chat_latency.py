@@ -0,0 +1,186 @@
+"""
+Coach chat benchmark against a local OpenAI-compatible stub server (no API key, no
+network): time to first token and request payload per turn over a long conversation,
+for the previous behaviour (whole history sent, full completion awaited) and the
+current one (token-budgeted history with a rolling summary, streamed answer).
+
+The stub simulates a prefill cost proportional to the request size and a fixed
+per-token decode delay. It can also be started on its own to run the app against it:
+
+    python benchmarks/chat_latency.py --serve --port 8001
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=stub streamlit run main.py
+
+Usage:
+    python benchmarks/chat_latency.py [--turns 40] [--report 1 10 20 40]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from helpers.chat_history import build_messages, fold_point, summarize
+
+# Coûts simulés du modèle
+PREFILL_SECONDS_PER_KB = 0.004
+TOKEN_SECONDS = 0.002
+ANSWER_WORDS = 150
+SUMMARY_WORDS = 60
+
+QUESTION = ("I train for a half marathon four times a week and want to lose a bit of weight "
+            "without losing energy. What should I eat before and after my long runs, and how "
+            "should I adapt my meals on rest days? ")
+SYSTEM = ("You are a helpful assistant specialized in nutrition and fitness.\n"
+          "The user has provided the following personal details:\n- Age: 31 years\n- Weight: 72 kg\n"
+          "- Height: 178 cm\n- Gender: Male\nAlways use the provided information to give personalized responses.")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions, réponse complète ou en SSE (stream=True)"""
+    protocol_version = "HTTP/1.1"
+    payloads = []  # tailles (octets) des requêtes reçues
+    summaries = 0  # requêtes de résumé (max_tokens fixé)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubHandler.payloads.append(len(body))
+        request = json.loads(body)
+        words = SUMMARY_WORDS if request.get("max_tokens") else ANSWER_WORDS
+        if request.get("max_tokens"):
+            StubHandler.summaries += 1
+        tokens = [f"word{i} " for i in range(words)]
+        time.sleep(PREFILL_SECONDS_PER_KB * len(body) / 1000)
+        created = int(time.time())
+
+        if not request.get("stream"):
+            time.sleep(TOKEN_SECONDS * len(tokens))
+            self._send(200, "application/json", json.dumps({
+                "id": "stub", "object": "chat.completion", "created": created, "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(tokens),
+                          "total_tokens": len(body) // 4 + len(tokens)},
+            }).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens + [None]):
+            if token is not None and i:
+                time.sleep(TOKEN_SECONDS)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": request["model"],
+                     "choices": [{"index": 0, "delta": {"content": token} if token else {},
+                                  "finish_reason": None if token else "stop"}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:  # client fermant une connexion keep-alive
+            pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_conversation(client, turns, budgeted):
+    """[(temps jusqu'au premier token, octets envoyés)] pour chaque tour"""
+    messages, summary, results = [], "", []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"({turn}) {QUESTION}"})
+        sent = len(StubHandler.payloads)
+        start = time.perf_counter()
+        if budgeted:
+            stream = client.chat.completions.create(
+                model="stub", messages=build_messages(SYSTEM, messages, summary), stream=True
+            )
+            first = None
+            parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first = first or time.perf_counter() - start
+                    parts.append(chunk.choices[0].delta.content)
+            answer = "".join(parts)
+        else:
+            response = client.chat.completions.create(
+                model="stub", messages=[{"role": "system", "content": SYSTEM}] + messages
+            )
+            first = time.perf_counter() - start
+            answer = response.choices[0].message.content
+        results.append((first, StubHandler.payloads[sent]))
+        messages.append({"role": "assistant", "content": answer})
+
+        if budgeted:
+            # comme pages/chat.fold_old_messages, après l'affichage de la réponse
+            folded = fold_point(messages)
+            if folded:
+                summary = summarize(client, summary, messages[:folded], model="stub")
+                del messages[:folded]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--report", type=int, nargs="+", default=[1, 10, 20, 40])
+    parser.add_argument("--serve", action="store_true", help="only run the stub server")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.serve:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+        print(f"OpenAI-compatible stub listening on http://127.0.0.1:{args.port}/v1")
+        server.serve_forever()
+        return
+
+    import openai
+
+    server = start_stub()
+    client = openai.Client(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="stub", max_retries=0)
+    baseline = run_conversation(client, args.turns, budgeted=False)
+    budgeted = run_conversation(client, args.turns, budgeted=True)
+    summaries = StubHandler.summaries
+    server.shutdown()
+
+    print(f"{'turn':>5} | {'full history, blocking':^26} | {'budgeted, streamed':^26}")
+    print(f"{'':>5} | {'first token':>12} {'payload':>13} | {'first token':>12} {'payload':>13}")
+    for turn in [t for t in args.report if t <= args.turns]:
+        (old_ttft, old_bytes), (new_ttft, new_bytes) = baseline[turn - 1], budgeted[turn - 1]
+        print(f"{turn:>5} | {old_ttft * 1000:>10.0f}ms {old_bytes:>11} B | {new_ttft * 1000:>10.0f}ms {new_bytes:>11} B")
+    print(f"median | {statistics.median(t for t, _ in baseline) * 1000:>10.0f}ms "
+          f"{statistics.median(b for _, b in baseline):>11.0f} B | "
+          f"{statistics.median(t for t, _ in budgeted) * 1000:>10.0f}ms "
+          f"{statistics.median(b for _, b in budgeted):>11.0f} B")
+    print(f"summary calls (budgeted): {summaries} over {args.turns} turns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Synthetic data generator: fills a users database (same schema as
+`helpers.database.init_db`) with configurable volumes of realistic users,
+Garmin activities, weigh-ins and logged meals (pdv).
+
+Every user gets the password `password` (hashed once, at BCRYPT_ROUNDS so that
+logins in the load test do not trigger a rehash).
+
+Usage:
+    python benchmarks/generate_users_db.py --output data/users_synthetic.db --users 2000 --years 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import bcrypt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helpers.database as database
+
+PASSWORD = "password"
+
+# Profils d'activités observés dans data/users.db : (nom, kcal moyennes, pas moyens)
+ACTIVITY_TYPES = [
+    ("Marche", 400, 8000),
+    ("Course à pied", 485, 8200),
+    ("Trail", 600, 8500),
+    ("Autre", 400, 8700),
+]
+
+
+def generate_user(rng, user_id, start, days, args):
+    gender = rng.choice(["M", "F"])
+    height = rng.gauss(178 if gender == "M" else 165, 7)
+    weight = rng.gauss(78 if gender == "M" else 64, 10)
+    birth_date = date(rng.randint(1955, 2006), rng.randint(1, 12), rng.randint(1, 28))
+    user = (user_id, f"user_{user_id}", birth_date.strftime('%Y-%m-%d'), round(weight, 1), round(height), gender)
+
+    activities, poids, pdv = [], [], []
+    trend = rng.uniform(-0.02, 0.02)  # kg / jour
+    for day in range(days):
+        current = start + timedelta(days=day)
+        if rng.random() < args.activities_per_day:
+            name, kcal, steps = rng.choice(ACTIVITY_TYPES)
+            hour = rng.randint(6, 20)
+            activities.append((
+                user_id, name,
+                datetime(current.year, current.month, current.day, hour, rng.randint(0, 59)).strftime('%Y-%m-%d %H:%M:%S'),
+                round(max(50, rng.gauss(kcal, kcal * 0.25))), round(rng.gauss(80, 3)),
+                max(0, int(rng.gauss(steps, steps * 0.3))),
+            ))
+        if rng.random() < args.weighins_per_week / 7:
+            poids.append((user_id, round(weight + trend * day + rng.gauss(0, 0.4), 1), current.strftime('%Y-%m-%d')))
+        for _ in range(rng.choice(range(args.meals_per_day + 1))):
+            calories = max(50, rng.gauss(550, 200))
+            pdv.append((
+                user_id, round(calories),
+                round(rng.uniform(5, 60)), round(rng.uniform(0, 80)), round(rng.uniform(2, 50)),
+                round(rng.uniform(5, 90)), round(rng.uniform(2, 70)), round(rng.uniform(3, 30)),
+                current.strftime('%Y-%m-%d'),
+            ))
+    return user, activities, poids, pdv
+
+
+def generate(path, args):
+    rng = random.Random(args.seed)
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=database.BCRYPT_ROUNDS)).decode()
+    days = int(args.years * 365)
+    start = date.today() - timedelta(days=days)
+
+    database.DB_FILE = path
+    database.init_db()
+    conn = sqlite3.connect(path)
+    first_id = (conn.execute("SELECT MAX(id) FROM users").fetchone()[0] or 0) + 1
+    counts = {"users": 0, "activities": 0, "poids": 0, "pdv": 0}
+
+    for user_id in range(first_id, first_id + args.users):
+        user, activities, poids, pdv = generate_user(rng, user_id, start, days, args)
+        conn.execute(
+            "INSERT INTO users (id, username, password_hash, birth_date, weight, height, gender) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user[0], user[1], password_hash) + user[2:],
+        )
+        conn.executemany(
+            "INSERT INTO activities (user_id, activity_name, start_time, calories, bmrCalories, steps) VALUES (?, ?, ?, ?, ?, ?)",
+            activities,
+        )
+        conn.executemany("INSERT INTO poids (user_id, poid, date) VALUES (?, ?, ?)", poids)
+        conn.executemany(
+            """INSERT INTO pdv (user_id, calories, total_fat_PDV, sugar_PDV, sodium_PDV, protein_PDV,
+            saturated_fat_PDV, carbohydrates_PDV, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            pdv,
+        )
+        counts["users"] += 1
+        counts["activities"] += len(activities)
+        counts["poids"] += len(poids)
+        counts["pdv"] += len(pdv)
+        if counts["users"] % 100 == 0:
+            conn.commit()
+    conn.commit()
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="data/users_synthetic.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--activities-per-day", type=float, default=0.6, help="probability of an activity each day")
+    parser.add_argument("--weighins-per-week", type=float, default=2)
+    parser.add_argument("--meals-per-day", type=int, default=3, help="max logged meals per day")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.output, args)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {counts} in {args.output} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
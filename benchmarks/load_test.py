@@ -0,0 +1,135 @@
+"""
+Multi-user load driver for helpers/database.py: simulates N concurrent
+Streamlit sessions (one thread each, like the Streamlit server) running the
+real dashboard reads and meal/weight logging writes against a database
+produced by generate_users_db.py.
+
+Reports throughput, p50/p99 latency per operation and the number of
+`database is locked` errors.
+
+Usage:
+    python benchmarks/generate_users_db.py --output /tmp/users.db --users 2000
+    python benchmarks/load_test.py --db /tmp/users.db --sessions 16 --duration 30
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helpers.database as database
+from bench_utils import percentile
+
+# Appels faits par pages/dashboard.show pour un rendu
+def dashboard_render(username, user_id):
+    history_start = date.today() - timedelta(days=365)
+    database.get_dashboard_data(username, since=history_start)
+
+
+def log_meal(username, user_id):
+    database.add_pdv(user_id, 550, 20, 15, 10, 30, 12, 18)
+
+
+def log_weight(username, user_id):
+    database.add_poids(user_id, 70.0)
+
+
+def login(username, user_id):
+    database.invalidate_user(username)
+    database.authenticate(username, "password")
+
+
+OPERATIONS = {
+    "dashboard": dashboard_render,
+    "log_meal": log_meal,
+    "log_weight": log_weight,
+    "login": login,
+}
+
+
+def session(users, mix, deadline, seed, latencies, errors, lock):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    local_latencies = defaultdict(list)
+    local_errors = defaultdict(int)
+    while time.perf_counter() < deadline:
+        user_id, username = rng.choice(users)
+        op = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            OPERATIONS[op](username, user_id)
+        except sqlite3.OperationalError as e:
+            local_errors["locked" if "locked" in str(e) else "other"] += 1
+            continue
+        local_latencies[op].append(time.perf_counter() - start)
+    with lock:
+        for op, values in local_latencies.items():
+            latencies[op].extend(values)
+        for kind, count in local_errors.items():
+            errors[kind] += count
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, weight = item.split("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"unknown operation {name!r}, expected one of {sorted(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="database produced by generate_users_db.py")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--mix", default="dashboard=80,log_meal=15,log_weight=4,login=1")
+    parser.add_argument("--no-cache", action="store_true", help="disable the profile cache")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    database.DB_FILE = args.db
+    if args.no_cache:
+        database.profile_cache.maxsize = 0
+    conn = sqlite3.connect(args.db)
+    users = conn.execute("SELECT id, username FROM users").fetchall()
+    conn.close()
+    mix = parse_mix(args.mix)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=session, args=(users, mix, deadline, args.seed + i, latencies, errors, lock))
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{len(users)} users, {args.sessions} sessions, {elapsed:.1f}s, mix={args.mix}")
+    print(f"{'operation':>12} {'count':>8} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for op in sorted(latencies):
+        values = latencies[op]
+        print(f"{op:>12} {len(values):>8} {len(values) / elapsed:>8.1f} "
+              f"{percentile(values, 50) * 1000:>8.2f} {percentile(values, 99) * 1000:>8.2f}")
+    all_values = [v for values in latencies.values() for v in values]
+    print(f"{'total':>12} {total:>8} {total / elapsed:>8.1f} "
+          f"{percentile(all_values, 50) * 1000:>8.2f} {percentile(all_values, 99) * 1000:>8.2f}")
+    print(f"'database is locked' errors: {errors['locked']}, other OperationalError: {errors['other']}")
+    print(f"profile cache: {database.profile_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Login throughput benchmark: runs `authenticate` from N concurrent threads
+(simulating Streamlit sessions) against a temporary users database, for
+several concurrency levels, and reports logins/s and p50/p99 latency.
+
+Usage:
+    python benchmarks/login_throughput.py --logins 64 --levels 1 2 4 8 16 --rounds 12
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helpers.database as database
+from bench_utils import percentile
+
+PASSWORD = "benchmark-password"
+
+
+def run_level(concurrency, logins, usernames):
+    latencies = []
+
+    def login(i):
+        start = time.perf_counter()
+        # on vide le cache de profil pour mesurer le vrai coût d'un login
+        database.invalidate_user(usernames[i % len(usernames)])
+        user = database.authenticate(usernames[i % len(usernames)], PASSWORD)
+        latencies.append(time.perf_counter() - start)
+        return user is not None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as sessions:
+        ok = sum(sessions.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "ok": ok,
+        "logins_per_s": logins / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64, help="logins per concurrency level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=database.BCRYPT_ROUNDS, help="bcrypt cost")
+    args = parser.parse_args()
+
+    database.BCRYPT_ROUNDS = args.rounds
+    tmpdir = tempfile.mkdtemp()
+    database.DB_FILE = os.path.join(tmpdir, "users.db")
+    try:
+        database.init_db()
+        usernames = [f"bench_{i}" for i in range(args.users)]
+        for username in usernames:
+            database.register_user(username, PASSWORD, date(1990, 1, 1), 175, 70, "M")
+
+        print(f"bcrypt rounds={args.rounds} workers={database.BCRYPT_WORKERS} logins/level={args.logins}")
+        print(f"{'concurrency':>11} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for level in args.levels:
+            r = run_level(level, args.logins, usernames)
+            assert r["ok"] == args.logins, "some logins failed"
+            print(f"{r['concurrency']:>11} {r['logins_per_s']:>9.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_ms']:>8.1f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Startup benchmark: time until the login form of `pages/main.py` is rendered in a
+fresh interpreter (Streamlit AppTest, temporary databases), with lazy page imports
+against eager imports of every page (previous behaviour), and the import cost of
+each page module on top of what the login form already loads (`-X importtime`).
+
+Usage:
+    python benchmarks/startup_time.py [--runs 3] [--top 3]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PAGES_DIR = os.path.join(ROOT, "pages")
+PAGES = ["dashboard", "alimentation", "informations", "chat", "visu", "activite"]
+# Modules chargés par main.py avant le formulaire de connexion
+LOGIN_IMPORTS = ["streamlit", "pandas", "streamlit_option_menu", "helpers.database", "helpers.fridge"]
+
+
+def render_login(eager):
+    """(dans un interpréteur neuf) temps du premier rendu de main.py jusqu'au formulaire de connexion"""
+    start = time.perf_counter()
+    sys.path[:0] = [ROOT, PAGES_DIR]
+    from streamlit.testing.v1 import AppTest
+    import helpers.database as database
+    import helpers.fridge as fridge
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        # bases temporaires : le benchmark ne touche ni data/users.db ni recipes.db
+        database.DB_FILE = os.path.join(tmpdir, "users.db")
+        fridge.RECIPES_DB = os.path.join(tmpdir, "recipes.db")
+        if eager:
+            for page in PAGES:
+                try:
+                    __import__(page)
+                except Exception:  # page inutilisable dans cet environnement (dépendance, données)
+                    pass
+        at = AppTest.from_file(os.path.join(PAGES_DIR, "main.py"), default_timeout=120).run()
+        assert any(widget.key == "login_user" for widget in at.text_input), "login form not rendered"
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    print(time.perf_counter() - start)
+
+
+def time_to_login(eager, runs):
+    """Temps mur (démarrage de l'interpréteur compris) et temps interne, médianes sur `runs`"""
+    walls, inner = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, __file__, "--render", "eager" if eager else "lazy"],
+            capture_output=True, text=True, check=True, cwd=ROOT,
+        ).stdout
+        walls.append(time.perf_counter() - start)
+        inner.append(float(output.split()[-1]))
+    return statistics.median(walls), statistics.median(inner)
+
+
+def import_cost(module, top):
+    """
+    Coût d'import cumulé de `module` (ms) au-delà des imports du formulaire de connexion,
+    et ses `top` imports directs les plus lourds ; None si l'import échoue.
+    """
+    code = (f"import sys; sys.path[:0] = [{ROOT!r}, {PAGES_DIR!r}]; "
+            f"import {', '.join(LOGIN_IMPORTS)}; import {module}")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    total, children = None, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                total = int(cumulative) / 1000
+                break
+            children = []  # imports directs d'un autre module de premier niveau
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+    return total, sorted(children, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=3, help="heaviest direct imports listed per page")
+    parser.add_argument("--render", choices=["lazy", "eager"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render:
+        render_login(args.render == "eager")
+        return
+
+    print("Import cost of each page on top of the login form (ms, -X importtime):")
+    for page in PAGES:
+        total, detail = import_cost(page, args.top)
+        if total is None:
+            print(f"  {page:<14} import failed: {detail}")
+        else:
+            heaviest = ", ".join(f"{name} {ms:.0f}" for ms, name in detail)
+            print(f"  {page:<14} {total:>8.0f}   ({heaviest})")
+
+    lazy_wall, lazy_inner = time_to_login(False, args.runs)
+    eager_wall, eager_inner = time_to_login(True, args.runs)
+    print(f"\nTime to login form (median of {args.runs}, interpreter start included / first render):")
+    print(f"  eager page imports {eager_wall:>6.2f}s / {eager_inner:.2f}s")
+    print(f"  lazy page imports  {lazy_wall:>6.2f}s / {lazy_inner:.2f}s   ({eager_wall / lazy_wall:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+from helpers.recipes_db import PDV_COLUMNS
+
+NUTRIENT_COLUMNS = ["calories"] + PDV_COLUMNS
+
+
+def remaining_budget(tdee, logged_pdv):
+    """
+    Budget restant de la journée : TDEE moins les calories loggées, 100% moins les PDV
+    loggés. `logged_pdv` : lignes de `database.get_pdv` (calories, 6 PDV, date).
+    """
+    logged = np.zeros(len(NUTRIENT_COLUMNS), dtype=np.float32)
+    for row in logged_pdv:
+        logged += np.nan_to_num(np.array(row[:len(NUTRIENT_COLUMNS)], dtype=np.float32))
+    daily = np.array([tdee] + [100.0] * len(PDV_COLUMNS), dtype=np.float32)
+    return daily - logged
+
+
+class BudgetRanker:
+    """
+    Classe les recettes selon leur adéquation au budget nutritionnel restant.
+
+    Le score d'une recette i est une distance quadratique pondérée entre ses
+    nutriments N_i et la cible t (budget restant / repas restants), plus un
+    terme nutriscore :
+        sum_j w_j ((N_ij - t_j) / s_j)^2 + alpha * nutriscore_i
+    Développé, c'est M_i · v + const avec M = [N², N, nutriscore] précalculée
+    une fois : chaque requête est un seul produit matrice-vecteur.
+    """
+
+    def __init__(self, food_data, weights=None, nutriscore_weight=0.05):
+        nutrients = food_data[NUTRIENT_COLUMNS].to_numpy(dtype=np.float32)
+        nutriscore = food_data["nutriscore"].to_numpy(dtype=np.float32)
+        self.valid = ~(np.isnan(nutrients).any(axis=1) | np.isnan(nutriscore))
+        nutrients = np.nan_to_num(nutrients)
+        self.matrix = np.hstack([nutrients ** 2, nutrients, np.nan_to_num(nutriscore)[:, None]])
+        # protéines : dépasser la cible est moins grave, poids réduit
+        self.weights = np.array(
+            [(weights or {}).get(c, 0.5 if c == "protein_PDV" else 1.0) for c in NUTRIENT_COLUMNS],
+            dtype=np.float32,
+        )
+        self.nutriscore_weight = nutriscore_weight
+
+    def scores(self, budget, meals_left=1, positions=None):
+        """Score (plus bas = meilleur) des recettes `positions` (toutes si None)"""
+        target = np.maximum(np.asarray(budget, dtype=np.float32), 0) / max(meals_left, 1)
+        scale = np.array([max(float(budget[0]), 1000.0)] + [100.0] * len(PDV_COLUMNS), dtype=np.float32)
+        a = self.weights / scale ** 2
+        vector = np.concatenate([a, -2 * a * target, [self.nutriscore_weight]]).astype(np.float32)
+        matrix = self.matrix if positions is None else self.matrix[positions]
+        scores = matrix @ vector
+        valid = self.valid if positions is None else self.valid[positions]
+        return np.where(valid, scores, np.inf)
+
+    def top_k(self, budget, k=10, meals_left=1, positions=None):
+        """Positions des `k` recettes les mieux adaptées, de la meilleure à la moins bonne"""
+        if positions is None:
+            positions = np.arange(len(self.matrix))
+        positions = np.asarray(positions)
+        if len(positions) == 0:
+            return positions
+        scores = self.scores(budget, meals_left, positions)
+        k = min(k, len(positions))
+        best = np.argpartition(scores, k - 1)[:k]
+        best = best[np.argsort(scores[best], kind="stable")]
+        return positions[best[np.isfinite(scores[best])]]
@@ -0,0 +1,299 @@
+import ctypes
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helpers.cache import LRUCache
+from helpers.ingredient_counts import COUNTS_FILE, load_vocabulary
+from helpers.list_columns import CATALOG_CSV, LIST_COLUMNS_FILE, RAW_LIST_COLUMNS, build_list_columns
+from helpers.metrics import connect, register_cache, timed
+from helpers.similar_recipes import INDEX_DIR, build_index
+from helpers import recipes_db
+
+# Magasin de versions du catalogue : chaque publication crée snapshots/<version>/
+# (CSV + index dérivés), puis le fichier CURRENT est remplacé atomiquement
+STORE_DIR = Path(__file__).parent.parent / "data" / "catalog"
+SNAPSHOTS_KEPT = 3
+
+# Texte long : jamais gardé dans le DataFrame servi, lu à la demande (recipes.db ou CSV)
+TEXT_COLUMNS = ["description", "steps", "tags"]
+
+# Valeurs nutritionnelles : toujours float32 (sommes et produits matriciels sans débordement)
+NUTRIENT_COLUMNS = ["calories"] + recipes_db.PDV_COLUMNS + [
+    "total_fat", "sugar", "sodium", "protein", "saturated_fat", "nutriscore",
+]
+
+text_cache = LRUCache(maxsize=4096)
+register_cache("text", text_cache.stats)
+_checked_stores = {}  # fichier texte -> empreinte du CSV avec laquelle il a été vérifié
+# Fichier texte du catalogue non publié (data/), écrit par l'étape recipe_text du pipeline
+TEXT_STORE_FILE = Path(__file__).parent.parent / "data" / "recipe_text.db"
+
+try:
+    import pyarrow  # chaînes Arrow : un buffer + offsets au lieu d'un objet par nom
+    NAME_DTYPE = "string[pyarrow]"
+except ImportError:
+    pyarrow = None
+    NAME_DTYPE = None
+
+
+def release_memory():
+    """
+    Rend au système la mémoire libérée après un chargement (buffers du parseur CSV,
+    colonnes intermédiaires) : sans cela le pool Arrow et le tas glibc la gardent et
+    la mémoire résidente reste celle du pic de lecture. Sans effet hors Linux/glibc.
+    """
+    if pyarrow is not None:
+        pyarrow.default_memory_pool().release_unused()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def compact_frame(food_data):
+    """
+    Version compacte du catalogue : nutriments en float32, autres entiers réduits au
+    plus petit type suffisant (int8/int16/int32), `grade` et `submitted` en catégories, noms en
+    chaînes Arrow (ou internés à défaut de pyarrow). Les colonnes texte et listes
+    sérialisées sont retirées (voir `recipe_text` et `list_columns`).
+    """
+    compact = food_data.drop(columns=[c for c in TEXT_COLUMNS + RAW_LIST_COLUMNS if c in food_data])
+    for column in compact.columns:
+        values = compact[column]
+        if column in NUTRIENT_COLUMNS:
+            compact[column] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values):
+            compact[column] = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_float_dtype(values):
+            compact[column] = values.astype(np.float32)
+    for column in ("grade", "submitted"):
+        if column in compact:
+            compact[column] = compact[column].astype("category")
+    if "name" in compact:
+        if NAME_DTYPE is not None:
+            compact["name"] = compact["name"].astype(NAME_DTYPE)
+        else:
+            compact["name"] = compact["name"].map(lambda name: sys.intern(name) if isinstance(name, str) else name)
+    return compact
+
+
+def load_compact(csv_path=CATALOG_CSV):
+    """Charge le catalogue directement sous forme compacte (texte long et listes jamais lus)"""
+    skipped = set(TEXT_COLUMNS + RAW_LIST_COLUMNS)
+    dtypes = {column: np.float32 for column in NUTRIENT_COLUMNS}
+    dtypes.update(grade="category", submitted="category")
+    food_data = pd.read_csv(csv_path, usecols=lambda column: column not in skipped, dtype=dtypes)
+    compact = compact_frame(food_data)
+    del food_data
+    release_memory()
+    return compact
+
+
+def bytes_per_recipe(frame):
+    return frame.memory_usage(deep=True, index=True).sum() / max(len(frame), 1)
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def write_text_store(csv_path, path, chunksize=50000):
+    """
+    Fichier annexe des colonnes texte (SQLite, id -> description/steps/tags compressés
+    en zlib) : `recipe_text` lit quelques lignes par clé primaire au lieu de parcourir
+    le CSV. Écrit à l'ingestion (publication, étape recipe_text du pipeline) dans un
+    fichier temporaire puis renommé ; garde la taille et la date du CSV source pour
+    détecter un fichier périmé. Renvoie le nombre de recettes écrites.
+    """
+    tmp_path = Path(f"{path}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = connect(tmp_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute(f"CREATE TABLE recipe_text (id INTEGER PRIMARY KEY, {', '.join(f'{c} BLOB' for c in TEXT_COLUMNS)})")
+    conn.execute("CREATE TABLE source (stamp TEXT)")
+    conn.execute("INSERT INTO source VALUES (?)", (_source_stamp(csv_path),))
+    header = pd.read_csv(csv_path, nrows=0).columns
+    columns = [column for column in TEXT_COLUMNS if column in header]
+    with conn:
+        for chunk in pd.read_csv(csv_path, usecols=["id", *columns], chunksize=chunksize):
+            conn.executemany(
+                f"INSERT OR IGNORE INTO recipe_text (id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                (
+                    (int(recipe_id), *(None if pd.isna(text) else zlib.compress(str(text).encode()) for text in texts))
+                    for recipe_id, *texts in zip(chunk["id"], *(chunk[column] for column in columns))
+                ),
+            )
+    n_recipes = conn.execute("SELECT COUNT(*) FROM recipe_text").fetchone()[0]
+    conn.close()
+    tmp_path.replace(path)
+    return n_recipes
+
+
+def _store_stamp(path):
+    try:
+        conn = connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT stamp FROM source").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def _text_store(paths):
+    """
+    Fichier texte du catalogue servi, ou None s'il manque ou ne correspond plus au CSV
+    (catalogue de data/ régénéré sans l'étape recipe_text, version publiée avant son
+    ajout) : il n'est jamais construit pendant une requête.
+    """
+    path = Path(paths["text"])
+    try:
+        stamp = _source_stamp(paths["csv"])
+    except OSError:
+        return None
+    if _checked_stores.get(path) != stamp:
+        if _store_stamp(path) != stamp:
+            return None
+        _checked_stores[path] = stamp
+    return path
+
+
+@timed()
+def recipe_text(recipe_ids, column="description", *, paths):
+    """
+    {id: texte} d'une colonne longue (description, steps, tags) pour quelques recettes,
+    lue par clé primaire dans le fichier texte de la version servie : `paths` est
+    obligatoire (`current_snapshot().paths` de la requête, pas le CURRENT du disque,
+    qui peut déjà désigner une autre version). Les textes récemment servis restent
+    dans `text_cache` ; textes à None si le fichier texte n'a pas été écrit pour ce catalogue.
+    """
+    recipe_ids = [int(recipe_id) for recipe_id in recipe_ids]
+    namespace = str(paths["text"])
+    texts = {}
+    missing = []
+    for recipe_id in recipe_ids:
+        if (namespace, recipe_id, column) in text_cache:
+            texts[recipe_id] = text_cache.get((namespace, recipe_id, column))
+        else:
+            missing.append(recipe_id)
+    if not missing:
+        return texts
+
+    store = _text_store(paths)
+    if store is None:
+        texts.update(dict.fromkeys(missing))
+        return texts
+    conn = connect(f"file:{store}?mode=ro", uri=True)
+    try:
+        rows = dict(conn.execute(
+            f"SELECT id, {column} FROM recipe_text WHERE id IN ({', '.join(['?'] * len(missing))})",
+            missing,
+        ).fetchall())
+    finally:
+        conn.close()
+    for recipe_id in missing:
+        blob = rows.get(recipe_id)
+        text = zlib.decompress(blob).decode() if blob is not None else None
+        texts[recipe_id] = text
+        text_cache.set((namespace, recipe_id, column), text)
+    return texts
+
+
+def current_version(store_dir=STORE_DIR):
+    """Version publiée courante (None si rien n'a été publié : catalogue de data/)"""
+    try:
+        return (Path(store_dir) / "CURRENT").read_text().strip() or None
+    except OSError:
+        return None
+
+
+def snapshot_paths(version, store_dir=STORE_DIR):
+    """Fichiers d'une version (version None -> emplacements historiques sous data/)"""
+    if version is None:
+        return {"csv": CATALOG_CSV, "list_columns": LIST_COLUMNS_FILE, "lsh_index": INDEX_DIR, "text": TEXT_STORE_FILE}
+    directory = Path(store_dir) / "snapshots" / version
+    return {
+        "csv": directory / "recipes.csv.gz",
+        "list_columns": directory / "list_columns.npz",
+        "lsh_index": directory / "lsh_index",
+        "text": directory / "recipe_text.db",
+    }
+
+
+@timed()
+def publish_snapshot(csv_path=CATALOG_CSV, store_dir=STORE_DIR, similar_index=True, vocabulary_path=COUNTS_FILE,
+                     recipes_db_path=None):
+    """
+    Publie un catalogue traité comme nouvelle version : copie du CSV et construction
+    des index dérivés dans un répertoire temporaire, renommage en snapshots/<version>,
+    puis bascule atomique de CURRENT. Les serveurs en cours détectent la nouvelle
+    version (voir `recipe_recommandation.current_snapshot`). Les codes d'ingrédients
+    suivent l'ordre de fréquence de `vocabulary_path` s'il existe.
+    Si recipes.db est utilisé (déjà chargé), il est rechargé avec cette version avant
+    la bascule ; tant qu'il ne correspond pas à la version servie, l'app n'utilise
+    pas ses requêtes SQL/FTS (voir `recipes_db.serves_version`).
+    """
+    recipes_db_path = recipes_db_path or recipes_db.RECIPES_DB
+    store_dir = Path(store_dir)
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    version = time.strftime("%Y%m%d-%H%M%S") + "-" + digest.hexdigest()[:8]
+    final = store_dir / "snapshots" / version
+    staging = store_dir / "snapshots" / f".{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    paths = {name: staging / Path(path).name for name, path in snapshot_paths(version, store_dir).items()}
+    if str(csv_path).endswith(".gz"):
+        shutil.copyfile(csv_path, paths["csv"])
+    else:
+        with open(csv_path, "rb") as source, gzip.open(paths["csv"], "wb") as target:
+            shutil.copyfileobj(source, target)
+    build_list_columns(paths["csv"], paths["list_columns"], categories=recipes_db.ingredients_categories,
+                       vocabulary=load_vocabulary(vocabulary_path))
+    write_text_store(paths["csv"], paths["text"])
+    if similar_index:
+        build_index(paths["csv"], paths["lsh_index"])
+    os.replace(staging, final)
+    if recipes_db.is_populated(recipes_db_path):
+        recipes_db.load_recipes_db(final / paths["csv"].name, recipes_db_path, version=version)
+
+    pointer = store_dir / "CURRENT.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, store_dir / "CURRENT")
+    _prune_snapshots(store_dir, keep=version)
+    return version
+
+
+def _prune_snapshots(store_dir, keep):
+    """Supprime les plus anciennes versions au-delà de SNAPSHOTS_KEPT (jamais `keep`)"""
+    versions = sorted(p for p in (Path(store_dir) / "snapshots").iterdir() if not p.name.startswith("."))
+    for directory in versions[:-SNAPSHOTS_KEPT]:
+        if directory.name != keep:
+            # un serveur peut encore mapper l'index LSH d'une ancienne version (Windows : échec ignoré)
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # python -m helpers.catalog publish [csv]
+    if len(sys.argv) > 1 and sys.argv[1] == "publish":
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else CATALOG_CSV
+        start = time.perf_counter()
+        version = publish_snapshot(csv_path)
+        print(f"Published catalog version {version} in {time.perf_counter() - start:.1f}s")
+    else:
+        print(f"current version: {current_version()}")
+        print("usage: python -m helpers.catalog publish [csv]")
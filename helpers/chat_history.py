@@ -0,0 +1,82 @@
+"""
+Historique du coach (pages/chat.py) borné en tokens : seuls les derniers messages qui
+tiennent dans le budget sont envoyés, les plus anciens sont résumés (un résumé court
+ajouté au message système). La taille de chaque requête reste stable quelle que soit
+la longueur de la conversation. Le repli se fait avec hystérésis : seulement quand
+l'historique dépasse le budget, et jusqu'à la moitié du budget, pour qu'un appel de
+résumé couvre plusieurs tours au lieu d'un par message.
+"""
+import os
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+# Budget (tokens) de l'historique envoyé, hors message système
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 1500))
+SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 200))
+# Surcoût approximatif d'un message (rôle, séparateurs)
+MESSAGE_OVERHEAD = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+except ImportError:
+    def count_tokens(text):
+        """Estimation sans tiktoken : ~4 caractères par token en anglais"""
+        return len(text) // 4 + 1
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def recent_window(messages, budget=CHAT_HISTORY_TOKENS):
+    """
+    Index du premier message envoyé : on remonte depuis le plus récent tant que le
+    budget le permet (le dernier message est toujours gardé).
+    """
+    used = 0
+    start = len(messages)
+    while start > 0:
+        used += message_tokens(messages[start - 1])
+        if used > budget and start < len(messages):
+            break
+        start -= 1
+    return start
+
+
+def fold_point(messages, budget=CHAT_HISTORY_TOKENS):
+    """
+    Nombre de messages à résumer : 0 tant que l'historique tient dans le budget, sinon
+    ce qu'il faut retirer pour revenir à la moitié du budget.
+    """
+    if sum(message_tokens(message) for message in messages) <= budget:
+        return 0
+    return recent_window(messages, budget // 2)
+
+
+def build_messages(system_context, messages, summary=None, budget=CHAT_HISTORY_TOKENS):
+    """Requête à envoyer : message système (contexte + résumé) puis la fenêtre récente"""
+    if summary:
+        system_context = f"{system_context}\nSummary of the earlier conversation:\n{summary}"
+    window = messages[recent_window(messages, budget):]
+    return [{"role": "system", "content": system_context}] + window
+
+
+def summarize(client, summary, messages, model=CHAT_MODEL, max_tokens=SUMMARY_MAX_TOKENS):
+    """Nouveau résumé : l'ancien résumé complété par `messages` (sortis de la fenêtre)"""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    response = client.chat.completions.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[
+            {"role": "system", "content": (
+                "Summarize this conversation between a user and a nutrition and fitness coach "
+                "in a few sentences. Keep the user's goals, constraints, preferences and any "
+                "advice already given."
+            )},
+            {"role": "user", "content": f"Previous summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+    )
+    return response.choices[0].message.content
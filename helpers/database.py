@@ -2,24 +2,54 @@ import sqlite3
 import bcrypt
 from datetime import date
 import json
-from garminconnect import Garmin
+import os
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+from helpers.cache import LRUCache
+from helpers.metrics import connect, register_cache, timed
 
 
 DB_FILE = "data/users.db"
 
+# Cache des profils (clé : (type, username, ...)), invalidé à chaque écriture
+PROFILE_CACHE_SIZE = 256
+PROFILE_CACHE_TTL = 60  # secondes
+profile_cache = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+register_cache("profile", profile_cache.stats)
+
+# bcrypt : coût configurable et nombre de hachages simultanés plafonné. bcrypt libère
+# déjà le GIL ; le pool ne rend rien asynchrone (l'appelant attend le résultat), il
+# borne seulement le CPU consommé par une rafale de logins à BCRYPT_WORKERS cœurs.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 2))
+_hash_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+# Version des données de chaque utilisateur, incrémentée à chaque écriture : les pages
+# peuvent garder leurs données en session tant que la version n'a pas changé
+_data_versions = {}
+
+def data_version(username):
+    """Version courante des données d'un utilisateur (change à chaque écriture le concernant)"""
+    return _data_versions.get(username, 0)
+
+def invalidate_user(username=None, user_id=None):
+    """Invalide les entrées du cache de profil d'un utilisateur et incrémente sa version de données"""
+    if username is None and user_id is not None:
+        # ("username", id) n'est pas touché par l'invalidation ci-dessous (key[1] est l'id)
+        username = profile_cache.peek(("username", user_id))
+        if username is None:
+            conn = connect(DB_FILE)
+            row = conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+            conn.close()
+            username = row[0] if row else None
+    if username is not None:
+        profile_cache.invalidate(lambda key: key[1] == username)
+        _data_versions[username] = _data_versions.get(username, 0) + 1
+
 def init_db():
     """Crée les tables users et activities si elles n'existent pas"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
 
-    # supprime garmin_id et garmin_password du user 1
-    cursor.execute("""
-    UPDATE users
-    SET weight = 70, birth_date = '2001-06-08'
-    WHERE id = 1
-    """)
-
     # detele table activities
     # cursor.execute("""
     # DROP TABLE IF EXISTS activities
@@ -40,6 +70,13 @@ def init_db():
     )
     """)
 
+    # supprime garmin_id et garmin_password du user 1
+    cursor.execute("""
+    UPDATE users
+    SET weight = 70, birth_date = '2001-06-08'
+    WHERE id = 1
+    """)
+
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS activities (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -79,10 +116,17 @@ def init_db():
     )
     """)
 
+    # Index (utilisateur, date) pour les requêtes d'historique bornées
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_activities_user_start ON activities (user_id, start_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_poids_user_date ON poids (user_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pdv_user_date ON pdv (user_id, date)")
+
     conn.commit()
     conn.close()
 
+@timed()
 def import_garmin_data(garmin_id, garmin_password):
+    from garminconnect import Garmin  # client HTTP lourd : importé seulement pour une synchro
     try:
         print(garmin_id, garmin_password)
         client = Garmin(garmin_id, garmin_password)
@@ -109,7 +153,7 @@ def import_garmin_data(garmin_id, garmin_password):
 
 def add_activity(user_id, garmin_id, garmin_password):
     """Ajoute une activité à un utilisateur sans doublons"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
 
     # Get activities from Garmin
@@ -125,61 +169,302 @@ def add_activity(user_id, garmin_id, garmin_password):
         conn.commit()
     except sqlite3.IntegrityError:
         conn.close()
+        invalidate_user(user_id=user_id)  # une partie a pu être insérée avant le doublon
         return False
 
     conn.close()
+    invalidate_user(user_id=user_id)
     return True
 
 
 def get_garmin_id(user_id):
     """Récupère l'identifiant Garmin et le mot de passe d'un utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("SELECT garmin_id, garmin_password FROM users WHERE id = ?", (user_id,))
     garmin_id, garmin_password = cursor.fetchone()
     conn.close()
     return garmin_id, garmin_password
 
-def get_activities(username):
-    """Récupère toutes les activités d'un utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+# ── Historiques bornés / paginés ─────────────────────────────────────────────
+# Pour chaque table d'historique : colonnes renvoyées, requête de base filtrée
+# sur l'utilisateur, colonne de date et clé primaire (départage pour le curseur).
+HISTORY_TABLES = {
+    "activities": {
+        "columns": ["activity_name", "start_time", "calories", "bmrCalories", "steps"],
+        "query": """
+        SELECT activity_name, start_time, calories, bmrCalories, steps, activities.id
+        FROM activities
+        JOIN users ON activities.user_id = users.id
+        WHERE users.username = ?""",
+        "date": "activities.start_time",
+        "id": "activities.id",
+    },
+    "poids": {
+        "columns": ["poid", "date"],
+        "query": "SELECT poid, date, id FROM poids WHERE user_id = ?",
+        "date": "date",
+        "id": "id",
+    },
+    "pdv": {
+        "columns": ["calories", "total_fat_PDV", "sugar_PDV", "sodium_PDV", "protein_PDV",
+                    "saturated_fat_PDV", "carbohydrates_PDV", "date"],
+        "query": """
+        SELECT calories, total_fat_PDV, sugar_PDV, sodium_PDV, protein_PDV, saturated_fat_PDV, carbohydrates_PDV, date, id
+        FROM pdv WHERE user_id = ?""",
+        "date": "date",
+        "id": "id",
+    },
+}
 
-    cursor.execute("""
-    SELECT activity_name, start_time, calories, bmrCalories, steps 
-    FROM activities 
-    JOIN users ON activities.user_id = users.id 
-    WHERE users.username = ?
-    """, (username,))
 
-    activities = cursor.fetchall()
-    conn.close()
+def _to_sql_date(value):
+    """Convertit une borne (date, datetime ou str) au format texte stocké en base"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value.strftime('%Y-%m-%d')
+
+
+def _history_query(table, since, until, limit, cursor):
+    spec = HISTORY_TABLES[table]
+    query = spec["query"]
+    params = []
+    if since is not None:
+        query += f" AND {spec['date']} >= ?"
+        params.append(_to_sql_date(since))
+    if until is not None:
+        query += f" AND {spec['date']} < ?"
+        params.append(_to_sql_date(until))
+    if cursor is not None:
+        # Keyset pagination : on reprend strictement après la dernière ligne vue
+        query += f" AND ({spec['date']}, {spec['id']}) < (?, ?)"
+        params.extend(cursor)
+    query += f" ORDER BY {spec['date']} DESC, {spec['id']} DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    return query, params
+
+
+def fetch_history(table, key, since=None, until=None, limit=None, cursor=None, conn=None):
+    """Récupère une page d'historique (plus récent d'abord) pour `key`
+    (username pour `activities`, user_id sinon).
+
+    Renvoie (lignes, curseur_suivant) ; le curseur est None quand il n'y a plus de page.
+    """
+    query, params = _history_query(table, since, until, limit, cursor)
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(DB_FILE)
+    try:
+        rows = conn.execute(query, [key] + params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    date_idx = HISTORY_TABLES[table]["columns"].index(
+        HISTORY_TABLES[table]["date"].split(".")[-1]
+    )
+    next_cursor = None
+    if limit is not None and rows and len(rows) == int(limit):
+        next_cursor = (rows[-1][date_idx], rows[-1][-1])
+    return [row[:-1] for row in rows], next_cursor
+
+
+def iter_history(table, key, since=None, until=None, batch_size=1000, as_columns=False):
+    """Parcourt l'historique par lots de `batch_size` lignes avec une mémoire bornée.
+
+    Chaque lot est une liste de tuples, ou un dict {colonne: numpy.ndarray}
+    si `as_columns` est vrai.
+    """
+    columns = HISTORY_TABLES[table]["columns"]
+    if as_columns:
+        import numpy as np
+
+    conn = connect(DB_FILE)
+    try:
+        cursor = None
+        while True:
+            rows, cursor = fetch_history(table, key, since, until, batch_size, cursor, conn=conn)
+            if rows:
+                if as_columns:
+                    yield {name: np.array(values) for name, values in zip(columns, zip(*rows))}
+                else:
+                    yield rows
+            if cursor is None:
+                break
+    finally:
+        conn.close()
+
+
+# ── Navigation admin (pages/visu.py) ─────────────────────────────────────────
+# Tables consultables : colonnes affichables (jamais les mots de passe), colonne de
+# date (filtre since/until) et colonne texte (recherche LIKE). Projection, filtres,
+# tri et pagination sont faits en SQL : une page coûte `limit` lignes, pas la table.
+BROWSE_TABLES = {
+    "users": {
+        "columns": ["id", "username", "birth_date", "weight", "height", "gender", "garmin_id"],
+        "user": "id",
+        "date": None,
+        "search": "username",
+    },
+    "activities": {
+        "columns": ["id", "user_id", "activity_name", "start_time", "calories", "bmrCalories", "steps"],
+        "user": "user_id",
+        "date": "start_time",
+        "search": "activity_name",
+    },
+    "poids": {
+        "columns": ["id", "user_id", "poid", "date"],
+        "user": "user_id",
+        "date": "date",
+        "search": None,
+    },
+    "pdv": {
+        "columns": ["id", "user_id", "calories", "total_fat_PDV", "sugar_PDV", "sodium_PDV", "protein_PDV",
+                    "saturated_fat_PDV", "carbohydrates_PDV", "date"],
+        "user": "user_id",
+        "date": "date",
+        "search": None,
+    },
+}
+
+
+def _browse_spec(table):
+    if table not in BROWSE_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    return BROWSE_TABLES[table]
+
+
+def _browse_where(table, filters):
+    """Clause WHERE (et paramètres) des filtres {"user_id", "since", "until", "search"}"""
+    spec = _browse_spec(table)
+    filters = filters or {}
+    clauses, params = [], []
+    if filters.get("user_id") is not None:
+        clauses.append(f"{spec['user']} = ?")
+        params.append(int(filters["user_id"]))
+    if spec["date"] is not None:
+        if filters.get("since") is not None:
+            clauses.append(f"{spec['date']} >= ?")
+            params.append(_to_sql_date(filters["since"]))
+        if filters.get("until") is not None:
+            clauses.append(f"{spec['date']} < ?")
+            params.append(_to_sql_date(filters["until"]))
+    if spec["search"] is not None and filters.get("search"):
+        clauses.append(f"{spec['search']} LIKE ? ESCAPE '\\'")
+        escaped = filters["search"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+    return clauses, params
+
+
+def _browse_query(table, columns, filters, order_by, descending, limit, cursor):
+    spec = _browse_spec(table)
+    columns = list(columns or spec["columns"])
+    unknown = [column for column in columns + [order_by] if column not in spec["columns"]]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    clauses, params = _browse_where(table, filters)
+    if cursor is not None:
+        # Keyset pagination sur (order_by, id). SQLite trie les NULL en premier en
+        # ordre croissant (donc en dernier en décroissant) et une comparaison avec NULL
+        # est fausse : on traite la frontière NULL / non NULL explicitement.
+        value, last_id = cursor
+        op = "<" if descending else ">"
+        if order_by == "id":
+            clauses.append(f"id {op} ?")
+            params.append(last_id)
+        elif value is None:
+            clauses.append(f"({order_by} IS NULL AND id {op} ?)" if descending else
+                           f"(({order_by} IS NULL AND id {op} ?) OR {order_by} IS NOT NULL)")
+            params.append(last_id)
+        else:
+            clauses.append(f"(({order_by}, id) {op} (?, ?)" + (f" OR {order_by} IS NULL)" if descending else ")"))
+            params.extend([value, last_id])
+
+    direction = "DESC" if descending else "ASC"
+    order = f"id {direction}" if order_by == "id" else f"{order_by} {direction}, id {direction}"
+    query = f"SELECT {', '.join(columns)}, {order_by}, id FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {order} LIMIT ?"
+    params.append(int(limit))
+    return query, params, columns
+
+
+@timed()
+def browse_table(table, columns=None, filters=None, order_by="id", descending=False, limit=50, cursor=None):
+    """Une page de `table` : seulement les `columns` demandées, filtrée et triée en SQL.
+
+    Renvoie (lignes, colonnes, curseur_suivant) ; le curseur (valeur de tri, id) de la
+    dernière ligne est None quand il n'y a plus de page (une ligne de plus est lue
+    pour le savoir).
+    """
+    limit = int(limit)
+    query, params, columns = _browse_query(table, columns, filters, order_by, descending, limit + 1, cursor)
+    conn = connect(DB_FILE)
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    next_cursor = (rows[limit - 1][-2], rows[limit - 1][-1]) if len(rows) > limit else None
+    return [row[:-2] for row in rows[:limit]], columns, next_cursor
+
+
+@timed()
+def table_summary(table, filters=None):
+    """Résumé des lignes filtrées par COUNT/MIN/MAX : {"rows", "users", "first", "last"}"""
+    spec = _browse_spec(table)
+    clauses, params = _browse_where(table, filters)
+    selects = ["COUNT(*)", f"COUNT(DISTINCT {spec['user']})"]
+    if spec["date"] is not None:
+        selects += [f"MIN({spec['date']})", f"MAX({spec['date']})"]
+    query = f"SELECT {', '.join(selects)} FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    conn = connect(DB_FILE)
+    try:
+        row = conn.execute(query, params).fetchone()
+    finally:
+        conn.close()
+    summary = {"rows": row[0], "users": row[1], "first": None, "last": None}
+    if spec["date"] is not None:
+        summary["first"], summary["last"] = row[2], row[3]
+    return summary
+
+
+@timed()
+def get_activities(username, since=None, until=None, limit=None, cursor=None):
+    """Récupère les activités d'un utilisateur (plus récentes d'abord).
+
+    `since` (inclus) et `until` (exclu) bornent la période, `limit` et `cursor`
+    permettent de paginer (voir `fetch_history`).
+    """
+    activities, _ = fetch_history("activities", username, since, until, limit, cursor)
     return activities
 
 def add_poids(user_id, poid):
     """Ajoute une nouvelle entrée de poids pour un utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("""
     INSERT INTO poids (user_id, poid, date) VALUES (?, ?, ?)
     """, (user_id, poid, date.today()))
     conn.commit()
     conn.close()
+    invalidate_user(user_id=user_id)
 
-def get_poids(user_id):
-    """Récupère l'historique de poids d'un utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-    SELECT poid, date FROM poids WHERE user_id = ? ORDER BY date DESC
-    """, (user_id,))
-    poids = cursor.fetchall()  
-    conn.close()
-    return poids    
+def get_poids(user_id, since=None, until=None, limit=None, cursor=None):
+    """Récupère l'historique de poids d'un utilisateur (voir `get_activities` pour les filtres)"""
+    poids, _ = fetch_history("poids", user_id, since, until, limit, cursor)
+    return poids
 
 def add_pdv(user_id, calories, total_fat_PDV=None, sugar_PDV=None, sodium_PDV=None, protein_PDV=None, saturated_fat_PDV=None, carbohydrates_PDV=None):
     """Ajoute une entrée de pourcentage de valeurs nutritionnelles"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("""
     INSERT INTO pdv (user_id, calories, total_fat_PDV, sugar_PDV, sodium_PDV, protein_PDV, saturated_fat_PDV, carbohydrates_PDV, date)
@@ -187,30 +472,74 @@ def add_pdv(user_id, calories, total_fat_PDV=None, sugar_PDV=None, sodium_PDV=No
     """, (user_id, calories, total_fat_PDV, sugar_PDV, sodium_PDV, protein_PDV, saturated_fat_PDV, carbohydrates_PDV, date.today()))
     conn.commit()
     conn.close()
+    invalidate_user(user_id=user_id)
 
-def get_pdv(user_id):
-    """Récupère les valeurs nutritionnelles pour un utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-    SELECT calories, total_fat_PDV, sugar_PDV, sodium_PDV, protein_PDV, saturated_fat_PDV, carbohydrates_PDV, date 
-    FROM pdv WHERE user_id = ? ORDER BY date DESC
-    """, (user_id,))
-    pdv_data = cursor.fetchall()
-    conn.close()
+def get_pdv(user_id, since=None, until=None, limit=None, cursor=None):
+    """Récupère les valeurs nutritionnelles pour un utilisateur (voir `get_activities` pour les filtres)"""
+    pdv_data, _ = fetch_history("pdv", user_id, since, until, limit, cursor)
     return pdv_data
 
-def hash_password(password):
-    """Hash le mot de passe"""
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+@timed()
+def get_dashboard_data(username, since=None):
+    """Toutes les données du tableau de bord en une connexion : profil, poids (dernière
+    pesée connue si aucune depuis `since`), activités et PDV depuis `since`.
+
+    Renvoie None si l'utilisateur n'existe pas.
+    """
+    user = get_user(username)
+    if user is None:
+        return None
+    user_id = user[0]
+    conn = connect(DB_FILE)
+    try:
+        weight, _ = fetch_history("poids", user_id, since, conn=conn)
+        if not weight:
+            weight, _ = fetch_history("poids", user_id, limit=1, conn=conn)
+        activities, _ = fetch_history("activities", username, since, conn=conn)
+        pdv_data, _ = fetch_history("pdv", user_id, since, conn=conn)
+    finally:
+        conn.close()
+    return {"user": user, "weight": weight, "activities": activities, "pdv": pdv_data}
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+def hash_password(password, rounds=None):
+    """Hash le mot de passe (bloquant ; au plus BCRYPT_WORKERS hachages simultanés, coût BCRYPT_ROUNDS par défaut)"""
+    return _hash_pool.submit(_hashpw, password, rounds or BCRYPT_ROUNDS).result()
 
 def verify_password(password, hashed_password):
-    """Vérifie si le mot de passe correspond au hash"""
-    return bcrypt.checkpw(password.encode(), hashed_password.encode())
+    """Vérifie si le mot de passe correspond au hash (bloquant, concurrence plafonnée par le pool)"""
+    return _hash_pool.submit(bcrypt.checkpw, password.encode(), hashed_password.encode()).result()
+
+def hash_rounds(hashed_password):
+    """Coût bcrypt d'un hash ($2b$<rounds>$...)"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+@timed()
+def authenticate(username, password):
+    """Vérifie les identifiants et renvoie l'utilisateur (None si invalides).
+
+    Si le hash stocké n'a pas le coût BCRYPT_ROUNDS courant, il est recalculé
+    de manière transparente avec le mot de passe qui vient d'être validé.
+    """
+    user = get_user(username)
+    if not user or not verify_password(password, user[2]):  # user[2] = password_hash
+        return None
+    if hash_rounds(user[2]) != BCRYPT_ROUNDS:
+        conn = connect(DB_FILE)
+        conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (hash_password(password), user[0]))
+        conn.commit()
+        conn.close()
+        invalidate_user(username)
+    return user
 
 def register_user(username, password, birth_date, height, weight, gender, garmin_id=None, garmin_password=None):
     """Ajoute un utilisateur dans la base avec les nouvelles données"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
 
     try:
@@ -228,19 +557,36 @@ def register_user(username, password, birth_date, height, weight, gender, garmin
         return False  # L'utilisateur existe déjà
     finally:
         conn.close()
+        invalidate_user(username)
         
+@timed()
 def get_user(username):
-    """Récupère les infos d'un utilisateur par son username"""
-    conn = sqlite3.connect(DB_FILE)
+    """Récupère les infos d'un utilisateur par son username (via le cache de profil)"""
+    user = profile_cache.get(("user", username))
+    if user is not None:
+        return user
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
     user = cursor.fetchone()
     conn.close()
+    if user is not None:
+        profile_cache.set(("user", username), user)
+        profile_cache.set(("username", user[0]), username)
     return user
 
+def get_recent_activities(username, limit=5):
+    """Récupère les `limit` dernières activités d'un utilisateur (via le cache de profil)"""
+    key = ("activities", username, limit)
+    activities = profile_cache.get(key)
+    if activities is None:
+        activities = get_activities(username, limit=limit)
+        profile_cache.set(key, activities)
+    return activities
+
 def update_user_info(username, birth_date=None, weight=None, height=None,  gender=None, garmin_id=None, garmin_password=None):
     """Met à jour les informations de l'utilisateur"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     
     updates = []
@@ -283,11 +629,12 @@ def update_user_info(username, birth_date=None, weight=None, height=None,  gende
     """, (birth_date, weight, height, gender, garmin_id, garmin_password, username))
     conn.commit()
     conn.close()
+    invalidate_user(username)
     
     return True
 
 def get_calories(user_id):
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect(DB_FILE)
     cursor = conn.cursor()
     today = date.today().strftime('%Y-%m-%d')
     cursor.execute("""
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Nombre maximal de points envoyés au navigateur par courbe, quel que soit l'historique
+MAX_POINTS = 400
+# Tailles de bucket possibles (fréquence pandas, durée en jours), de la plus fine à la plus large
+BUCKETS = [("D", 1), ("W", 7), ("MS", 30.44)]
+
+
+def bucket_for(start, end, max_points=MAX_POINTS):
+    """Bucket le plus fin (jour, semaine, mois) qui couvre [start, end] en au plus `max_points` points"""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)) / pd.Timedelta(days=1) + 1
+    for freq, length in BUCKETS:
+        if days / length <= max_points:
+            return freq
+    return BUCKETS[-1][0]
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets : indices de `threshold` points (premier et dernier
+    compris) qui conservent la forme visuelle de la courbe (x croissant).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == threshold - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_end = edges[i + 2]
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # aire du triangle (point retenu précédent, candidat, moyenne du bucket suivant)
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(dates, values, how=None, max_points=MAX_POINTS, period=None):
+    """
+    Série prête à tracer (index = dates), d'au plus `max_points` points :
+    - how=None : points bruts, réduits par LTTB si trop nombreux (mesures comme le poids) ;
+    - how="mean" : moyenne par bucket (jour/semaine/mois choisi selon la période couverte) ;
+    - how="daily" : total par jour, puis moyenne des totaux journaliers par bucket si la
+      période impose des semaines ou des mois (l'échelle reste comparable à un objectif
+      journalier).
+    `period` : (début, fin) de la plage affichée, qui fixe la taille des buckets ; une
+    borne à None est remplacée par l'étendue des données.
+    """
+    series = pd.Series(np.asarray(values, dtype=np.float64), index=pd.to_datetime(pd.Index(dates), errors="coerce"))
+    series = series[series.index.notna() & series.notna()].sort_index()
+    if series.empty:
+        return series
+
+    if how is not None:
+        start, end = period if period is not None else (None, None)
+        freq = bucket_for(series.index[0] if start is None else start,
+                          series.index[-1] if end is None else end, max_points)
+        if how == "daily":
+            series = series.groupby(series.index.normalize()).sum()
+            if freq != "D":
+                series = series.resample(freq).mean().dropna()
+        else:
+            series = series.resample(freq).mean().dropna()
+
+    if len(series) > max_points:
+        keep = lttb(series.index.to_numpy().astype(np.int64), series.to_numpy(), max_points)
+        series = series.iloc[keep]
+    return series
@@ -3,8 +3,11 @@ import os
 from pathlib import Path
 import cv2
 
+from helpers.metrics import timed
+
 image_output_folder = Path("data/fridge_images/output")
 
+@timed()
 def analyse_frigo(image_path: str) -> tuple[list[str], str]:
     """
     Retourne (ingredients_detectes, chemin_de_l_image_annotée)
@@ -0,0 +1,140 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.metrics import connect, timed
+from helpers.recipes_db import RECIPES_DB
+
+RECOMMENDATIONS_LIMIT = 10
+
+# Inventaire du frigo par utilisateur (détections YOLO + éditions manuelles) et
+# recommandations "cuisinables maintenant" précalculées à chaque changement
+FRIDGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fridge_contents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    ingredient_name VARCHAR NOT NULL,
+    quantity INTEGER DEFAULT 1,
+    source VARCHAR CHECK(source IN ('yolo', 'manual')),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, ingredient_name)
+);
+
+CREATE TABLE IF NOT EXISTS user_recommendations (
+    user_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    recipe_id INTEGER NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, rank)
+);
+"""
+
+# Attente max. (s) du verrou de recipes.db : couvre un rechargement du catalogue
+# (recipes_db.load_recipes_db), pendant lequel les écritures du frigo patientent
+BUSY_TIMEOUT = 30
+
+# Un seul worker : les recalculs sont séquentiels et ne concurrencent pas les rendus
+_jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fridge")
+_versions = {}
+_computed = {}  # user_id -> version du dernier recalcul terminé
+_versions_lock = threading.Lock()
+
+
+def init_fridge_db():
+    """Crée les tables du frigo (remplace l'ancienne fridge_contents sans user_id, jamais utilisée)"""
+    conn = connect(RECIPES_DB, timeout=BUSY_TIMEOUT)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(fridge_contents)")]
+    if columns and "user_id" not in columns:
+        conn.execute("DROP TABLE fridge_contents")
+    conn.executescript(FRIDGE_SCHEMA)
+    conn.commit()
+    conn.close()
+
+
+def get_fridge(user_id):
+    """Inventaire {ingrédient: quantité} d'un utilisateur"""
+    conn = connect(RECIPES_DB, timeout=BUSY_TIMEOUT)
+    rows = conn.execute(
+        "SELECT ingredient_name, quantity FROM fridge_contents WHERE user_id = ? ORDER BY ingredient_name",
+        (user_id,),
+    ).fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def set_fridge(user_id, ingredients, source="manual"):
+    """
+    Remplace l'inventaire de l'utilisateur (une détection YOLO ou une sélection manuelle
+    décrit tout le frigo ; les doublons donnent la quantité) puis planifie le recalcul
+    des recommandations. Une édition manuelle conserve la quantité des ingrédients gardés.
+    """
+    quantities = Counter(ingredient.lower() for ingredient in ingredients)
+    if source == "manual":
+        existing = get_fridge(user_id)
+        quantities = {name: existing.get(name, quantity) for name, quantity in quantities.items()}
+    conn = connect(RECIPES_DB, timeout=BUSY_TIMEOUT)
+    with conn:
+        conn.execute("DELETE FROM fridge_contents WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO fridge_contents (user_id, ingredient_name, quantity, source) VALUES (?, ?, ?, ?)",
+            [(user_id, name, quantity, source) for name, quantity in quantities.items()],
+        )
+    conn.close()
+    return schedule_recompute(user_id)
+
+
+def schedule_recompute(user_id):
+    """Planifie le recalcul des recommandations en arrière-plan (les demandes obsolètes sont ignorées)"""
+    with _versions_lock:
+        version = _versions.get(user_id, 0) + 1
+        _versions[user_id] = version
+    return _jobs.submit(_recompute_if_current, user_id, version)
+
+
+def _recompute_if_current(user_id, version):
+    with _versions_lock:
+        if _versions.get(user_id) != version:
+            return None  # un changement plus récent sera traité par son propre job
+    recipe_ids = recompute_recommendations(user_id)
+    with _versions_lock:
+        _computed[user_id] = max(version, _computed.get(user_id, 0))
+    return recipe_ids
+
+
+def recommendations_version(user_id):
+    """Version des recommandations enregistrées (change quand un recalcul se termine)"""
+    with _versions_lock:
+        return _computed.get(user_id, 0)
+
+
+@timed()
+def recompute_recommendations(user_id, limit=RECOMMENDATIONS_LIMIT):
+    """Calcule et enregistre les meilleures recettes réalisables avec le frigo actuel"""
+    from helpers.recipe_recommandation import find_recipes  # charge le catalogue, donc import tardif
+
+    ingredients = list(get_fridge(user_id))
+    recipe_ids = []
+    if ingredients:
+        matches = find_recipes(ingredients, min_matches=min(3, len(ingredients)), limit=limit)
+        recipe_ids = [int(recipe_id) for recipe_id in matches["id"]]
+
+    conn = connect(RECIPES_DB, timeout=BUSY_TIMEOUT)
+    with conn:
+        conn.execute("DELETE FROM user_recommendations WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO user_recommendations (user_id, rank, recipe_id) VALUES (?, ?, ?)",
+            [(user_id, rank, recipe_id) for rank, recipe_id in enumerate(recipe_ids)],
+        )
+    conn.close()
+    return recipe_ids
+
+
+@timed()
+def get_cookable_now(user_id):
+    """Identifiants des recettes précalculées pour le frigo de l'utilisateur, par rang"""
+    conn = connect(RECIPES_DB, timeout=BUSY_TIMEOUT)
+    rows = conn.execute(
+        "SELECT recipe_id FROM user_recommendations WHERE user_id = ? ORDER BY rank", (user_id,)
+    ).fetchall()
+    conn.close()
+    return [recipe_id for (recipe_id,) in rows]
@@ -0,0 +1,116 @@
+"""
+Vocabulaire des ingrédients du catalogue : nombre d'occurrences de chaque
+ingrédient (forme normalisée), calculé en streaming. Le CSV est lu par chunks, chaque
+chunk est compté dans un processus de travail et les compteurs sont fusionnés au fil
+de l'eau : la mémoire est bornée par la taille du vocabulaire, pas par le nombre de
+lignes (pas de table « explosée »).
+
+Usage:
+    python -m helpers.ingredient_counts [csv] [--top 50] [--workers N]
+"""
+import argparse
+import csv
+import heapq
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+from helpers.list_columns import normalize_ingredient, parse_list
+
+file_path = "data/processed_recipes.csv"
+COUNTS_FILE = Path(__file__).parent.parent / "data" / "ingredient_counts.txt"
+
+
+def count_chunk(values):
+    """Compteur {ingrédient normalisé: occurrences} d'une liste de cellules `ingredients`"""
+    counts = Counter()
+    for value in values:
+        counts.update(token for token in (normalize_ingredient(item) for item in parse_list(value) if item) if token)
+    return counts
+
+
+def count_ingredients(csv_path=file_path, chunksize=50_000, workers=None):
+    """
+    Compte les ingrédients de tout le CSV en une passe. Au plus 2 chunks par processus
+    sont en vol : la lecture ne prend pas d'avance illimitée sur le comptage.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = (chunk["ingredients"].tolist()
+              for chunk in pd.read_csv(csv_path, usecols=["ingredients"], chunksize=chunksize))
+    counts = Counter()
+    if workers == 1:
+        for values in chunks:
+            counts.update(count_chunk(values))
+        return counts
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for values in chunks:
+            pending.add(pool.submit(count_chunk, values))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts.update(future.result())
+        for future in pending:
+            counts.update(future.result())
+    return counts
+
+
+def top_k(counts, k):
+    """Les k ingrédients les plus fréquents (tas de taille k, sans trier tout le vocabulaire)"""
+    return heapq.nlargest(k, counts.items(), key=lambda item: item[1])
+
+
+def write_counts(counts, path=COUNTS_FILE):
+    """Écrit tous les comptes (ingredient,count), du plus fréquent au plus rare"""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ingredient", "count"])
+        writer.writerows(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def read_counts(path=COUNTS_FILE):
+    """
+    Relit un fichier de comptes ; les ingrédients sont renormalisés, ce qui fusionne
+    aussi les entrées d'anciens fichiers découpés sur les virgules ("['butter").
+    """
+    table = pd.read_csv(path, keep_default_na=False)
+    counts = Counter()
+    for token, count in zip(table.iloc[:, 0], table.iloc[:, 1]):
+        token = normalize_ingredient(str(token))
+        if token:
+            counts[token] += int(count)
+    return counts
+
+
+def vocabulary(counts, min_count=1):
+    """Ingrédients par fréquence décroissante (codes entiers courts pour les plus fréquents)"""
+    return [token for token, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            if count >= min_count]
+
+
+def load_vocabulary(path=COUNTS_FILE, min_count=1):
+    """Vocabulaire du fichier de comptes, ou None s'il n'a pas été généré"""
+    return vocabulary(read_counts(path), min_count) if Path(path).exists() else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", default=file_path)
+    parser.add_argument("--output", default=COUNTS_FILE)
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = count_ingredients(args.csv, args.chunksize, args.workers)
+    write_counts(counts, args.output)
+    print(f"{len(counts)} distinct ingredients ({sum(counts.values())} occurrences) "
+          f"saved to {args.output} in {time.perf_counter() - start:.1f}s")
+    for token, count in top_k(counts, args.top):
+        print(f"{count:>8}  {token}")
@@ -2,6 +2,9 @@ import pandas as pd
 from fuzzywuzzy import fuzz
 from tqdm import tqdm  # For progress bar
 
+from helpers.ingredient_counts import COUNTS_FILE, count_chunk, load_vocabulary
+from helpers.list_columns import normalize_ingredient
+
 # Define the 30 ingredients/categories
 ingredients_categories = [
     "apple", "banana", "beef", "blueberries", "bread", "butter", "carrot", "cheese", "chicken", "chicken_breast",
@@ -17,26 +20,69 @@ def map_to_category_fuzzy(ingredient):
             return category
     return None  # Return None if no match is found
 
-# Load the dataset
+def category_aliases(tokens):
+    """
+    Alias list {normalized ingredient: category or None}: the fuzzy matcher runs once per
+    distinct ingredient of the vocabulary instead of once per occurrence.
+    """
+    return {token: map_to_category_fuzzy(token) for token in tqdm(tokens, desc="Matching ingredients")}
+
+_vocabulary_aliases = {}
+
+def vocabulary_aliases(path=COUNTS_FILE):
+    """
+    Alias list of the whole vocabulary (data/ingredient_counts.txt), built once per process
+    and shared by every chunk; None if the counts file has not been generated.
+    """
+    path = str(path)
+    if path not in _vocabulary_aliases:
+        tokens = load_vocabulary(path)
+        _vocabulary_aliases[path] = None if tokens is None else category_aliases(tokens)
+    return _vocabulary_aliases[path]
+
 file_path = "data/processed_recipes.csv"
-df = pd.read_csv(file_path)
+output_file = "data/processed_recipes_with_categories.csv"
 
-# Enable the progress bar
-tqdm.pandas(desc="Processing Ingredients")
+def add_categories(df):
+    """
+    Row-wise stage: splits the ingredients into a list and maps each one to a category
+    (fuzzy matching on the normalized vocabulary, see `vocabulary_aliases`; falls back to
+    the vocabulary of the rows when the counts file is missing).
+    Rows are independent, so the pipeline can run it on new rows only.
+    """
+    df = df.copy()
+    df["ingredients_list"] = df["ingredients"].apply(lambda x: x.split(",") if isinstance(x, str) else [])
+    aliases = vocabulary_aliases()
+    if aliases is None:
+        aliases = category_aliases(count_chunk(df["ingredients"]))
 
-# Process the ingredients: split them into a list and apply fuzzy matching with a progress bar
-df["ingredients_list"] = df["ingredients"].apply(lambda x: x.split(",") if isinstance(x, str) else [])
-df["category_list_fuzzy"] = df["ingredients_list"].progress_apply(lambda x: [map_to_category_fuzzy(ingredient.strip()) for ingredient in x])
+    def category(ingredient):
+        token = normalize_ingredient(ingredient)
+        if token not in aliases:  # piece of an ingredient that contains a comma
+            aliases[token] = map_to_category_fuzzy(token)
+        return aliases[token]
 
-# Filter rows that have at least one category from the 30 ingredients
-df_filtered = df[df["category_list_fuzzy"].apply(lambda x: any(category is not None for category in x))]
+    df["category_list_fuzzy"] = df["ingredients_list"].apply(lambda x: [category(ingredient) for ingredient in x])
+    return df
 
-# Print some information about the progress
-print(f"Processed {len(df)} rows.")
-print(f"Filtered {len(df_filtered)} rows with at least one matched ingredient.")
+def has_category(df):
+    """Rows that have at least one category from the 30 ingredients"""
+    return df["category_list_fuzzy"].apply(lambda x: any(category is not None for category in x))
 
-# Save the updated dataframe with the category list to a new CSV
-output_file = "data/processed_recipes_with_categories.csv"
-df_filtered.to_csv(output_file, index=False)
 
-print(f"Updated CSV with filtered ingredients saved to {output_file}")
+if __name__ == "__main__":
+    # python -m helpers.ingredients
+    # Load the dataset
+    df = add_categories(pd.read_csv(file_path))
+
+    # Filter rows that have at least one category from the 30 ingredients
+    df_filtered = df[has_category(df)]
+
+    # Print some information about the progress
+    print(f"Processed {len(df)} rows.")
+    print(f"Filtered {len(df_filtered)} rows with at least one matched ingredient.")
+
+    # Save the updated dataframe with the category list to a new CSV
+    df_filtered.to_csv(output_file, index=False)
+
+    print(f"Updated CSV with filtered ingredients saved to {output_file}")
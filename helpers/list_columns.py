@@ -0,0 +1,165 @@
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATALOG_CSV = "data/processed_recipes_with_categories.csv.gz"
+LIST_COLUMNS_FILE = Path(__file__).parent.parent / "data" / "list_columns.npz"
+
+# Colonnes du catalogue stockées en listes Python sérialisées ("['a', 'b']").
+# `ingredients_list` est `ingredients` découpé sur les virgules : une fois nettoyé
+# c'est la même liste, elle est donc servie par la colonne `ingredients`.
+RAW_LIST_COLUMNS = ["ingredients", "ingredients_list", "category_list_fuzzy", "nutrition"]
+TYPED_COLUMNS = ("ingredients", "category_list_fuzzy", "nutrition")
+# Seules colonnes chargées par l'application (nutrition double les colonnes calories/PDV)
+SERVED_COLUMNS = ("ingredients",)
+NUTRITION_COLUMNS = ["calories", "total_fat_PDV", "sugar_PDV", "sodium_PDV",
+                     "protein_PDV", "saturated_fat_PDV", "carbohydrates_PDV"]
+
+# Éléments d'un repr de liste Python : 'texte', "texte (avec ')" ou None
+_ITEM = re.compile(r"'([^']*)'|\"([^\"]*)\"|(None)")
+
+
+def parse_list(value):
+    """"['a', 'b', None]" -> ["a", "b", None] (listes déjà décodées renvoyées telles quelles)"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if not isinstance(value, str):
+        return []
+    return [None if none else single or double for single, double, none in _ITEM.findall(value)]
+
+
+def normalize_ingredient(token):
+    """Forme canonique d'un ingrédient : minuscules, espaces réduits, sans crochets ni guillemets de repr"""
+    return " ".join(token.strip().strip("[]'\"").lower().split())
+
+
+class ListColumn:
+    """
+    Colonne de listes encodée contre un vocabulaire partagé (format CSR) :
+    les éléments de la ligne i sont vocabulary[codes[offsets[i]:offsets[i + 1]]].
+    Le code -1 représente None (catégorie non reconnue).
+    """
+
+    def __init__(self, vocabulary, offsets, codes):
+        self.vocabulary = np.asarray(vocabulary)
+        self.offsets = np.asarray(offsets)
+        self.codes = np.asarray(codes)
+
+    @classmethod
+    def from_lists(cls, lists, vocabulary=None):
+        """Encode des listes de chaînes ; vocabulaire trié construit si non fourni"""
+        lists = [[None if item is None else normalize_ingredient(str(item)) for item in items] for items in lists]
+        if vocabulary is None:
+            vocabulary = sorted({item for items in lists for item in items if item is not None})
+        lookup = {token: code for code, token in enumerate(vocabulary)}
+        lengths = np.fromiter((len(items) for items in lists), dtype=np.int64, count=len(lists))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        dtype = np.int16 if len(vocabulary) < np.iinfo(np.int16).max else np.int32
+        codes = np.fromiter(
+            (-1 if item is None else lookup.get(item, -1) for items in lists for item in items),
+            dtype=dtype, count=int(offsets[-1]),
+        )
+        return cls(np.array(vocabulary, dtype=str), offsets, codes)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        codes = self.codes[self.offsets[position]:self.offsets[position + 1]]
+        return [None if code < 0 else str(self.vocabulary[code]) for code in codes]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def token_mask(self, predicate):
+        """Masque booléen du vocabulaire : tokens vérifiant `predicate`"""
+        return np.fromiter((predicate(token) for token in self.vocabulary), dtype=bool,
+                           count=len(self.vocabulary))
+
+    def rows_containing(self, token_mask):
+        """Masque booléen des lignes contenant au moins un token du masque (sans parcours de chaînes)"""
+        hits = np.zeros(len(self.codes) + 1, dtype=np.int64)
+        valid = self.codes >= 0
+        hits[1:][valid] = token_mask[self.codes[valid]]
+        cumulative = np.cumsum(hits)
+        return cumulative[self.offsets[1:]] > cumulative[self.offsets[:-1]]
+
+    def nbytes(self):
+        return self.vocabulary.nbytes + self.offsets.nbytes + self.codes.nbytes
+
+
+def encode_catalog(food_data, categories=None, names=TYPED_COLUMNS, vocabulary=None):
+    """
+    Colonnes typées `names` du catalogue : `ingredients` et `category_list_fuzzy` en
+    ListColumn (la seconde alignée sur la première, vocabulaire = catégories),
+    `nutrition` en matrice float32 (n, 7). `vocabulary` : ordre imposé des codes
+    d'ingrédients (ex. par fréquence, voir `ingredient_counts`), complété par les
+    ingrédients absents.
+    """
+    columns = {}
+    if "ingredients" in names:
+        ingredient_lists = [parse_list(v) for v in food_data["ingredients"]]
+        if vocabulary is not None:
+            known = set(vocabulary)
+            extra = {normalize_ingredient(item) for items in ingredient_lists for item in items if item is not None}
+            vocabulary = list(vocabulary) + sorted(extra - known)
+        columns["ingredients"] = ListColumn.from_lists(ingredient_lists, vocabulary=vocabulary)
+    if "category_list_fuzzy" in names:
+        category_lists = [parse_list(v) for v in food_data["category_list_fuzzy"]]
+        if categories is None:
+            categories = sorted({c for items in category_lists for c in items if c is not None})
+        columns["category_list_fuzzy"] = ListColumn.from_lists(category_lists, vocabulary=list(categories))
+    if "nutrition" in names:
+        nutrition = np.full((len(food_data), len(NUTRITION_COLUMNS)), np.nan, dtype=np.float32)
+        for i, value in enumerate(food_data["nutrition"]):
+            values = [float(x) for x in re.findall(r"-?\d+(?:\.\d+)?(?:e-?\d+)?", str(value))][:len(NUTRITION_COLUMNS)]
+            nutrition[i, :len(values)] = values
+        columns["nutrition"] = nutrition
+    return columns
+
+
+def save_list_columns(ids, columns, path=LIST_COLUMNS_FILE):
+    """Écrit les colonnes typées (et les ids qu'elles indexent) dans un .npz"""
+    arrays = {"ids": np.asarray(ids, dtype=np.int64), "nutrition": columns["nutrition"]}
+    for name in ("ingredients", "category_list_fuzzy"):
+        column = columns[name]
+        arrays[f"{name}.vocabulary"] = column.vocabulary
+        arrays[f"{name}.offsets"] = column.offsets
+        arrays[f"{name}.codes"] = column.codes
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **arrays)
+
+
+def load_list_columns(ids, path=LIST_COLUMNS_FILE, names=TYPED_COLUMNS):
+    """Colonnes typées `names` écrites par l'ingestion, ou None si absentes / d'un autre catalogue"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if not np.array_equal(data["ids"], np.asarray(ids, dtype=np.int64)):
+            return None
+        columns = {"nutrition": data["nutrition"]} if "nutrition" in names else {}
+        for name in {"ingredients", "category_list_fuzzy"} & set(names):
+            columns[name] = ListColumn(data[f"{name}.vocabulary"], data[f"{name}.offsets"], data[f"{name}.codes"])
+    return columns
+
+
+def build_list_columns(csv_path=CATALOG_CSV, path=LIST_COLUMNS_FILE, categories=None, vocabulary=None):
+    """Étape d'ingestion : parse une fois les listes sérialisées du catalogue et les sauvegarde"""
+    food_data = pd.read_csv(csv_path, usecols=["id"] + RAW_LIST_COLUMNS)
+    columns = encode_catalog(food_data, categories, vocabulary=vocabulary)
+    save_list_columns(food_data["id"], columns, path)
+    return len(food_data), columns
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else CATALOG_CSV
+    start = time.perf_counter()
+    n, columns = build_list_columns(csv_path)
+    size = sum(c.nbytes() for c in (columns["ingredients"], columns["category_list_fuzzy"])) + columns["nutrition"].nbytes
+    print(f"Encoded {n} recipes ({len(columns['ingredients'].vocabulary)} distinct ingredients, "
+          f"{size / 1e6:.1f} MB) into {LIST_COLUMNS_FILE} in {time.perf_counter() - start:.1f}s")
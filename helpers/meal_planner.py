@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+# Poids des termes du coût d'un plan (plus bas = meilleur)
+CALORIE_WEIGHT = 10.0     # écart relatif au TDEE, au carré, par jour
+PDV_WEIGHT = 50.0         # dépassement de 100% d'un PDV, au carré, par jour
+NUTRISCORE_WEIGHT = 0.05  # par repas (nutriscore bas = meilleur)
+FRIDGE_WEIGHT = 0.3       # bonus par ingrédient du frigo utilisé par un repas
+REUSE_WEIGHT = 0.1        # bonus par réutilisation d'une catégorie d'ingrédient dans la semaine
+
+
+def _day_cost(totals, tdee):
+    """Coût nutritionnel d'une (ou plusieurs, en lignes) journée(s) : totals[..., 0] = calories, [1:] = PDV"""
+    calories = ((totals[..., 0] - tdee) / tdee) ** 2
+    overflow = (np.maximum(totals[..., 1:] - 100.0, 0) / 100.0) ** 2
+    return CALORIE_WEIGHT * calories + PDV_WEIGHT * overflow.sum(axis=-1)
+
+
+def _reuse_bonus(counts):
+    return np.maximum(counts - 1, 0).sum(axis=-1)
+
+
+def optimize_plan(nutrients, nutriscore, categories, fridge, tdee, days=7, meals_per_day=3,
+                  time_limit=0.5, seed=0):
+    """
+    Choisit days x meals_per_day recettes distinctes parmi un pool de candidats.
+
+    nutrients : (P, 7) calories + 6 PDV ; nutriscore : (P,) ; categories : (P, C) bool ;
+    fridge : (C,) bool. Heuristique : remplissage glouton jour par jour, puis descente
+    par coordonnées (un créneau à la fois, tous les candidats évalués d'un coup en
+    numpy) jusqu'à convergence ou `time_limit` secondes.
+    Renvoie un tableau (days, meals_per_day) d'indices dans le pool.
+    """
+    pool = len(nutrients)
+    slots = days * meals_per_day
+    if pool < slots:
+        raise ValueError(f"candidate pool too small ({pool}) for {slots} meals")
+
+    deadline = time.perf_counter() + time_limit
+    rng = np.random.default_rng(seed)
+    nutrients = nutrients.astype(np.float64)
+    categories = categories.astype(np.int32)
+    # coût propre à chaque recette (indépendant du reste du plan)
+    meal_cost = NUTRISCORE_WEIGHT * nutriscore - FRIDGE_WEIGHT * (categories @ fridge.astype(np.int32))
+
+    plan = np.full((days, meals_per_day), -1, dtype=np.int64)
+    used = np.zeros(pool, dtype=bool)
+    counts = np.zeros(categories.shape[1], dtype=np.int32)
+    day_totals = np.zeros((days, nutrients.shape[1]))
+
+    def slot_costs(day, current, target=tdee):
+        """Coût total du plan pour chaque candidat placé dans le créneau (vectorisé)"""
+        base = day_totals[day] - (nutrients[current] if current >= 0 else 0)
+        base_counts = counts - (categories[current] if current >= 0 else 0)
+        costs = (
+            _day_cost(base + nutrients, target)
+            + meal_cost
+            - REUSE_WEIGHT * _reuse_bonus(base_counts + categories)
+        )
+        taken = used.copy()
+        if current >= 0:
+            taken[current] = False
+        costs[taken] = np.inf
+        return costs
+
+    def place(day, meal, candidate):
+        current = plan[day, meal]
+        if current >= 0:
+            used[current] = False
+            day_totals[day] -= nutrients[current]
+            counts[:] -= categories[current]
+        plan[day, meal] = candidate
+        used[candidate] = True
+        day_totals[day] += nutrients[candidate]
+        counts[:] += categories[candidate]
+
+    # Glouton : chaque créneau reçoit le meilleur candidat étant donné les précédents,
+    # avec une cible calorique proportionnelle au nombre de repas déjà placés
+    for day in range(days):
+        for meal in range(meals_per_day):
+            target = tdee * (meal + 1) / meals_per_day
+            place(day, meal, int(np.argmin(slot_costs(day, -1, target))))
+
+    # Descente par coordonnées sur les créneaux, dans un ordre aléatoire
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for flat in rng.permutation(slots):
+            day, meal = divmod(int(flat), meals_per_day)
+            current = plan[day, meal]
+            costs = slot_costs(day, current)
+            best = int(np.argmin(costs))
+            if best != current and costs[best] < costs[current] - 1e-9:
+                place(day, meal, best)
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return plan
+
+
+def plan_cost(plan, nutrients, nutriscore, categories, fridge, tdee):
+    """Coût total d'un plan (même fonction objectif que `optimize_plan`)"""
+    totals = nutrients[plan].sum(axis=1)
+    counts = categories[plan.ravel()].astype(np.int32).sum(axis=0)
+    meal_cost = NUTRISCORE_WEIGHT * nutriscore - FRIDGE_WEIGHT * (categories.astype(np.int32) @ fridge.astype(np.int32))
+    return float(_day_cost(totals, tdee).sum() + meal_cost[plan].sum() - REUSE_WEIGHT * _reuse_bonus(counts))
@@ -0,0 +1,223 @@
+"""
+Instrumentation légère : durées (spans / décorateur `timed`), compteurs, statistiques
+des caches et nombre de requêtes SQLite, exportés au format texte Prometheus ou dans
+un fichier JSONL tournant.
+
+Configuration par variables d'environnement :
+    METRICS=off|prometheus|jsonl   (off par défaut : `timed` renvoie la fonction telle
+                                    quelle, `span`/`count` ne font rien)
+    METRICS_PORT=9464              (prometheus : http://localhost:9464/metrics)
+    METRICS_HOST=127.0.0.1         (interface d'écoute ; 0.0.0.0 pour un scrape distant)
+    METRICS_FILE=data/metrics.jsonl, METRICS_MAX_BYTES, METRICS_INTERVAL (jsonl)
+"""
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+EXPORT = os.getenv("METRICS", "off").lower()
+ENABLED = EXPORT in ("prometheus", "jsonl")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))
+# Local par défaut : les métriques (durées par fonction, tailles de cache) ne sont pas publiques
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.getenv("METRICS_FILE", "data/metrics.jsonl")
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES", 10_000_000))
+METRICS_BACKUPS = 3
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 15))
+PREFIX = "app"
+# Bornes (secondes) de l'histogramme des spans
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> valeur
+_histograms = {}  # (name, labels) -> [compte par bucket..., +Inf, somme]
+_caches = {}      # nom -> fonction renvoyant un dict de stats
+_events = None    # logger JSONL des spans (mode jsonl)
+_exporter = None
+
+_NOOP = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Incrémente le compteur `name` (exporté en app_<name>_total)"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Ajoute une durée à l'histogramme `name`"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+    if _events is not None:
+        _events.info(json.dumps({"ts": time.time(), "span": name, **labels, "seconds": round(seconds, 6)}))
+
+
+@contextmanager
+def _span(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("span_seconds", time.perf_counter() - start, span=name, **labels)
+
+
+def span(name, **labels):
+    """Bloc chronométré : `with span("alimentation.yolo"): ...` (no-op si désactivé)"""
+    return _span(name, labels) if ENABLED else _NOOP
+
+
+def timed(name=None):
+    """Décorateur : chronomètre chaque appel (la fonction n'est pas enveloppée si désactivé)"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_cache(name, stats):
+    """Expose les stats d'un cache (`stats` : callable renvoyant un dict), lues à l'export"""
+    _caches[name] = stats
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect qui compte les requêtes exécutées (par base) si les métriques sont actives"""
+    conn = sqlite3.connect(database, **kwargs)
+    if ENABLED:
+        db = Path(str(database).split("?")[0].removeprefix("file:")).stem
+        conn.set_trace_callback(lambda statement: count("db_queries", db=db))
+    return conn
+
+
+def snapshot():
+    """État courant : {"counters", "histograms", "caches"}"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+    caches = {}
+    for name, stats in list(_caches.items()):
+        try:
+            caches[name] = {k: v for k, v in (stats() or {}).items() if isinstance(v, (int, float))}
+        except Exception:  # cache pas encore construit ou en cours de remplacement
+            continue
+    return {"counters": counters, "histograms": histograms, "caches": caches}
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+
+def render_prometheus():
+    """Métriques au format texte d'exposition Prometheus"""
+    state = snapshot()
+    lines = []
+    for name in sorted({name for name, _ in state["counters"]}):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        for (metric, labels), value in sorted(state["counters"].items()):
+            if metric == name:
+                lines.append(f"{PREFIX}_{name}_total{_labels(labels)} {value}")
+    for name in sorted({name for name, _ in state["histograms"]}):
+        lines.append(f"# TYPE {PREFIX}_{name} histogram")
+        for (metric, labels), values in sorted(state["histograms"].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS) + ["+Inf"], values[:-1]):
+                cumulative += n
+                lines.append(f"{PREFIX}_{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{PREFIX}_{name}_sum{_labels(labels)} {values[-1]}")
+            lines.append(f"{PREFIX}_{name}_count{_labels(labels)} {cumulative}")
+    for field in sorted({field for stats in state["caches"].values() for field in stats}):
+        lines.append(f"# TYPE {PREFIX}_cache_{field} gauge")
+        for cache, stats in sorted(state["caches"].items()):
+            if field in stats:
+                lines.append(f"{PREFIX}_cache_{field}{_labels((('cache', cache),))} {stats[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def _serve_prometheus():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def _dump_periodically(logger):
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        state = snapshot()
+        logger.info(json.dumps({
+            "ts": time.time(),
+            "counters": {f"{name}{_labels(labels)}": value for (name, labels), value in state["counters"].items()},
+            "spans": {f"{name}{_labels(labels)}": {"count": sum(values[:-1]), "sum": round(values[-1], 6)}
+                      for (name, labels), values in state["histograms"].items()},
+            "caches": state["caches"],
+        }))
+
+
+def start_exporter():
+    """Démarre l'export configuré (une fois par processus) ; sans effet si METRICS=off"""
+    global _exporter, _events
+    if not ENABLED or _exporter is not None:
+        return
+    if EXPORT == "prometheus":
+        _exporter = _serve_prometheus()
+    else:
+        from logging.handlers import RotatingFileHandler
+
+        Path(METRICS_FILE).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(METRICS_FILE, maxBytes=METRICS_MAX_BYTES, backupCount=METRICS_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("helpers.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _events = logger
+        _exporter = threading.Thread(target=_dump_periodically, args=(logger,), name="metrics", daemon=True)
+        _exporter.start()
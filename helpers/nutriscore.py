@@ -1,9 +1,8 @@
 import pandas as pd
 import ast
 
-# Load dataset
 file_path = "data/RAW_recipes.csv"
-df = pd.read_csv(file_path)
+output_file = "data/processed_recipes.csv"
 
 # Define daily reference values for PDV conversion
 daily_values = {
@@ -35,19 +34,21 @@ def extract_nutrition(nutrition_str):
     except:
         return None  # Return None if there's an error
 
-# Apply extraction to dataset
-nutrition_data = df["nutrition"].apply(extract_nutrition)
-nutrition_df = pd.DataFrame(nutrition_data.tolist())
+def add_nutrition_columns(df):
+    """Extracts the nutrition list into columns and converts PDVs to absolute amounts."""
+    nutrition_data = df["nutrition"].apply(extract_nutrition)
+    nutrition_df = pd.DataFrame(nutrition_data.tolist(), index=df.index)
 
-# Merge extracted columns back into dataset
-df = pd.concat([df, nutrition_df], axis=1)
+    # Merge extracted columns back into dataset
+    df = pd.concat([df, nutrition_df], axis=1)
 
-# Convert PDV percentages to absolute values per 100g
-df["total_fat"] = df["total_fat_PDV"].apply(lambda x: convert_pdv_to_amount(x, "total_fat") if pd.notna(x) else None)
-df["sugar"] = df["sugar_PDV"].apply(lambda x: convert_pdv_to_amount(x, "sugar") if pd.notna(x) else None)
-df["sodium"] = df["sodium_PDV"].apply(lambda x: convert_pdv_to_amount(x, "sodium") if pd.notna(x) else None)
-df["protein"] = df["protein_PDV"].apply(lambda x: convert_pdv_to_amount(x, "protein") if pd.notna(x) else None)
-df["saturated_fat"] = df["saturated_fat_PDV"].apply(lambda x: convert_pdv_to_amount(x, "saturated_fat") if pd.notna(x) else None)
+    # Convert PDV percentages to absolute values per 100g
+    df["total_fat"] = df["total_fat_PDV"].apply(lambda x: convert_pdv_to_amount(x, "total_fat") if pd.notna(x) else None)
+    df["sugar"] = df["sugar_PDV"].apply(lambda x: convert_pdv_to_amount(x, "sugar") if pd.notna(x) else None)
+    df["sodium"] = df["sodium_PDV"].apply(lambda x: convert_pdv_to_amount(x, "sodium") if pd.notna(x) else None)
+    df["protein"] = df["protein_PDV"].apply(lambda x: convert_pdv_to_amount(x, "protein") if pd.notna(x) else None)
+    df["saturated_fat"] = df["saturated_fat_PDV"].apply(lambda x: convert_pdv_to_amount(x, "saturated_fat") if pd.notna(x) else None)
+    return df
 
 # Nutri-Score calculation functions
 def energy_points(energy):
@@ -92,16 +93,28 @@ def calculate_nutriscore(energy, sugars, sat_fat, sodium, protein):
 
     return final_score, grade
 
-# Apply Nutri-Score calculation
-df["nutriscore"], df["grade"] = zip(*df.apply(lambda row: calculate_nutriscore(
-    row["calories"], row["sugar"], row["saturated_fat"], row["sodium"], row["protein"]
-), axis=1))
+def process_recipes(df):
+    """
+    Row-wise stage: nutrition columns, Nutri-Score and grade for each recipe.
+    Rows are independent, so the pipeline can run it on new rows only.
+    """
+    df = add_nutrition_columns(df)
 
-# Sort by nutriscore in descending order
-df = df.sort_values(by="nutriscore", ascending=True)
+    # Apply Nutri-Score calculation
+    df["nutriscore"], df["grade"] = zip(*df.apply(lambda row: calculate_nutriscore(
+        row["calories"], row["sugar"], row["saturated_fat"], row["sodium"], row["protein"]
+    ), axis=1))
+    return df
 
-# Save to new CSV
-output_file = "data/processed_recipes.csv"
-df.to_csv(output_file, index=False)
+def sort_recipes(df):
+    # Sort by nutriscore in descending order
+    return df.sort_values(by="nutriscore", ascending=True, kind="stable")
+
+
+if __name__ == "__main__":
+    df = sort_recipes(process_recipes(pd.read_csv(file_path)))
+
+    # Save to new CSV
+    df.to_csv(output_file, index=False)
 
-print(f"Processed dataset saved to {output_file} (sorted by descending Nutri-Score)")
+    print(f"Processed dataset saved to {output_file} (sorted by descending Nutri-Score)")
@@ -0,0 +1,261 @@
+"""
+Pipeline de prétraitement du catalogue de recettes :
+
+    RAW_recipes.csv -> nutriscore -> processed_recipes.csv
+                    -> ingredient_counts -> ingredient_counts.txt
+                    -> ingredients -> processed_recipes_with_categories.csv.gz
+                    -> score_analysis -> nutriscore_analysis.txt
+                    -> recipe_text -> recipe_text.db (textes longs lus à la demande)
+                    -> publish -> nouvelle version du catalogue (catalog.publish_snapshot)
+
+Une étape est sautée si ses entrées (hash du contenu) et son code n'ont pas changé.
+Les étapes ligne à ligne (nutriscore, ingredients) gardent en cache le résultat de
+chaque ligne par hash : quand RAW_recipes.csv grossit, seules les lignes nouvelles
+ou modifiées sont retraitées.
+
+Usage:
+    python -m helpers.pipeline [--stages nutriscore ingredients ...] [--force STAGE ... | --force-all]
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HELPERS_DIR = Path(__file__).parent
+DATA_DIR = HELPERS_DIR.parent / "data"
+CACHE_DIR = DATA_DIR / ".pipeline"
+MANIFEST_FILE = CACHE_DIR / "manifest.json"
+ROW_HASH = "_row_hash"
+# À incrémenter si la logique du runner change le contenu produit
+PIPELINE_VERSION = "1"
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    Étape du pipeline : entrées et sorties déclarées, module de code (son source fait
+    partie de l'empreinte). Une étape ligne à ligne fournit `process` (lignes -> lignes,
+    indépendantes entre elles) et `finalize` (tri / filtre sur le tableau complet) ;
+    une étape agrégée fournit `run`. `stat_inputs` : la taille et la date des entrées
+    font aussi partie de l'empreinte (sortie qui les enregistre, comme recipe_text.db).
+    """
+
+    def __init__(self, name, module, inputs, outputs, process=None, finalize=None, run=None, stat_inputs=False):
+        self.name = name
+        self.module = module
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.process = process
+        self.finalize = finalize
+        self.run = run
+        self.stat_inputs = stat_inputs
+
+    def code_version(self):
+        digest = hashlib.sha256(PIPELINE_VERSION.encode())
+        digest.update((HELPERS_DIR / f"{self.module}.py").read_bytes())
+        return digest.hexdigest()
+
+    def fingerprint(self):
+        parts = [self.code_version()] + [f"{p}:{file_digest(p)}" for p in self.inputs]
+        if self.stat_inputs:
+            parts += [f"{p}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in self.inputs]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def function(self, name):
+        return getattr(importlib.import_module(f"helpers.{self.module}"), name)
+
+
+def _nutriscore_stage():
+    return Stage(
+        "nutriscore", "nutriscore",
+        inputs=[DATA_DIR / "RAW_recipes.csv"], outputs=[DATA_DIR / "processed_recipes.csv"],
+        process="process_recipes", finalize="sort_recipes",
+    )
+
+
+def _filter_categories(df):
+    has_category = importlib.import_module("helpers.ingredients").has_category
+    return df[has_category(df)]
+
+
+def _ingredients_stage():
+    return Stage(
+        "ingredients", "ingredients",
+        inputs=[DATA_DIR / "processed_recipes.csv", DATA_DIR / "ingredient_counts.txt"],
+        outputs=[DATA_DIR / "processed_recipes_with_categories.csv.gz"],
+        process="add_categories", finalize=_filter_categories,
+    )
+
+
+def _run_score_analysis(stage):
+    score_analysis = importlib.import_module("helpers.score_analysis")
+    rows = score_analysis.run_report(stage.inputs[0], stage.outputs[0], stage.outputs[1].parent)
+    return {"rows": rows}
+
+
+def _run_ingredient_counts(stage):
+    ingredient_counts = importlib.import_module("helpers.ingredient_counts")
+    counts = ingredient_counts.count_ingredients(stage.inputs[0])
+    ingredient_counts.write_counts(counts, stage.outputs[0])
+    return {"ingredients": len(counts), "occurrences": sum(counts.values())}
+
+
+def _run_recipe_text(stage):
+    from helpers.catalog import write_text_store
+
+    return {"recipes": write_text_store(stage.inputs[0], stage.outputs[0])}
+
+
+def _run_publish(stage):
+    from helpers.catalog import publish_snapshot
+
+    version = publish_snapshot(stage.inputs[0], vocabulary_path=stage.inputs[1])
+    return {"version": version}
+
+
+STAGES = [
+    _nutriscore_stage(),
+    Stage("ingredient_counts", "ingredient_counts",
+          inputs=[DATA_DIR / "processed_recipes.csv"], outputs=[DATA_DIR / "ingredient_counts.txt"],
+          run=_run_ingredient_counts),
+    _ingredients_stage(),
+    Stage("score_analysis", "score_analysis",
+          inputs=[DATA_DIR / "processed_recipes.csv"],
+          outputs=[DATA_DIR / "nutriscore_analysis.txt", DATA_DIR / "reports" / "nutriscore_distribution.png",
+                   DATA_DIR / "reports" / "grade_distribution.png"],
+          run=_run_score_analysis),
+    Stage("recipe_text", "catalog",
+          inputs=[DATA_DIR / "processed_recipes_with_categories.csv.gz"], outputs=[DATA_DIR / "recipe_text.db"],
+          run=_run_recipe_text, stat_inputs=True),
+    Stage("publish", "catalog",
+          inputs=[DATA_DIR / "processed_recipes_with_categories.csv.gz", DATA_DIR / "ingredient_counts.txt"],
+          outputs=[DATA_DIR / "catalog" / "CURRENT"],
+          run=_run_publish),
+]
+
+
+def _row_cache_path(stage, code_version):
+    return CACHE_DIR / f"{stage.name}-{code_version[:16]}.rows.pkl"
+
+
+def run_row_wise(stage):
+    """
+    Exécute une étape ligne à ligne : seules les lignes d'entrée dont le hash n'est pas
+    dans le cache de l'étape (même version de code) passent par `process` ; la sortie
+    est reconstruite dans l'ordre de l'entrée puis passée à `finalize`.
+    """
+    df = pd.read_csv(stage.inputs[0])
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    code_version = stage.code_version()
+    cache_path = _row_cache_path(stage, code_version)
+    cached = pd.read_pickle(cache_path) if cache_path.exists() else None
+
+    new = ~pd.Index(hashes).isin(cached[ROW_HASH]) if cached is not None else np.ones(len(df), dtype=bool)
+    pending = df[new].assign(**{ROW_HASH: hashes[new]}).drop_duplicates(ROW_HASH)
+    kept = cached[cached[ROW_HASH].isin(hashes)] if cached is not None else None
+    removed = len(cached) - len(kept) if cached is not None else 0
+
+    parts = [kept] if kept is not None else []
+    if len(pending):
+        process = stage.function(stage.process)
+        row_hashes = pending.pop(ROW_HASH).to_numpy()
+        processed = process(pending)
+        processed[ROW_HASH] = row_hashes
+        parts.append(processed)
+    table = pd.concat(parts, ignore_index=True) if parts else df.assign(**{ROW_HASH: hashes})
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for stale in CACHE_DIR.glob(f"{stage.name}-*.rows.pkl"):
+        if stale != cache_path:
+            stale.unlink()
+    table.to_pickle(cache_path)
+
+    output = table.drop_duplicates(ROW_HASH).set_index(ROW_HASH).loc[hashes].reset_index(drop=True)
+    finalize = stage.finalize if callable(stage.finalize) else stage.function(stage.finalize)
+    output = finalize(output)
+    output.to_csv(stage.outputs[0], index=False)
+    return {"rows": len(df), "new_rows": int(new.sum()), "removed_rows": removed, "output_rows": len(output)}
+
+
+def _load_manifest():
+    try:
+        return json.loads(MANIFEST_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def _up_to_date(stage, entry, fingerprint):
+    if entry.get("fingerprint") != fingerprint:
+        return False
+    outputs = entry.get("outputs", {})
+    return all(p.exists() and outputs.get(str(p)) == file_digest(p) for p in stage.outputs)
+
+
+def run_pipeline(stages=None, force=(), log=print):
+    """
+    Exécute les étapes (toutes par défaut, dans l'ordre) ; `force` : noms d'étapes à
+    réexécuter même si elles sont à jour. Renvoie {étape: rapport} (temps, lignes).
+    """
+    manifest = _load_manifest()
+    reports = {}
+    for stage in STAGES:
+        if stages and stage.name not in stages:
+            continue
+        missing = [str(p) for p in stage.inputs if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"stage {stage.name}: missing input(s) {', '.join(missing)}")
+        fingerprint = stage.fingerprint()
+        if stage.name not in force and _up_to_date(stage, manifest.get(stage.name, {}), fingerprint):
+            log(f"[{stage.name}] up to date, skipped")
+            reports[stage.name] = {"skipped": True}
+            continue
+
+        start = time.perf_counter()
+        report = stage.run(stage) if stage.run else run_row_wise(stage)
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        manifest[stage.name] = {
+            "fingerprint": fingerprint,
+            "outputs": {str(p): file_digest(p) for p in stage.outputs},
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **report,
+        }
+        _save_manifest(manifest)
+        reports[stage.name] = report
+        log(f"[{stage.name}] " + ", ".join(f"{k}={v}" for k, v in report.items()))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    names = [stage.name for stage in STAGES]
+    parser.add_argument("--stages", nargs="+", choices=names, help="stages to run (default: all)")
+    parser.add_argument("--force", nargs="+", choices=names, default=[], help="rerun even if up to date")
+    parser.add_argument("--force-all", action="store_true")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    run_pipeline(args.stages, names if args.force_all else args.force)
+    print(f"Pipeline finished in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
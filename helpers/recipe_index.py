@@ -0,0 +1,110 @@
+import numpy as np
+
+# Bornes des buckets (encodage par intervalle : bitmap "valeur <= borne")
+MINUTES_BUCKETS = (10, 15, 20, 30, 45, 60, 90, 120, 240)
+CALORIES_BUCKETS = (100, 200, 300, 400, 500, 600, 800, 1000, 1500)
+N_INGREDIENTS_BUCKETS = (3, 5, 7, 9, 12, 15, 20)
+
+
+def _pack(mask):
+    """Tableau booléen -> bitmap compacté (1 bit par recette)"""
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+class RecipeIndex:
+    """
+    Index bitmap sur le catalogue de recettes : un bitmap par grade, par catégorie
+    d'ingrédient et par bucket (minutes, calories, nombre d'ingrédients).
+    Les filtres se combinent par AND/OR bit à bit sur ~n/8 octets ; seules les
+    positions finales sont matérialisées en lignes.
+    """
+
+    def __init__(self, food_data, categories, ingredients):
+        """`ingredients` : colonne typée (`list_columns.ListColumn`) alignée sur food_data"""
+        self.size = len(food_data)
+        self.grades = {
+            grade: _pack(food_data["grade"].to_numpy() == grade)
+            for grade in food_data["grade"].dropna().unique()
+        }
+        # même règle que propose_recipes : la catégorie apparaît dans un des ingrédients,
+        # évaluée une fois sur le vocabulaire puis projetée sur les lignes
+        self.categories = {
+            category: _pack(ingredients.rows_containing(ingredients.token_mask(lambda token: category in token)))
+            for category in categories
+        }
+        self.values = {}
+        self.buckets = {}
+        for column, edges in (
+            ("minutes", MINUTES_BUCKETS),
+            ("calories", CALORIES_BUCKETS),
+            ("n_ingredients", N_INGREDIENTS_BUCKETS),
+        ):
+            values = food_data[column].to_numpy(dtype=np.float32)
+            self.values[column] = values
+            self.buckets[column] = [(edge, _pack(values <= edge)) for edge in edges]
+        self._all = _pack(np.ones(self.size, dtype=bool))
+
+    def empty_bitmap(self):
+        return np.zeros_like(self._all)
+
+    def _at_most(self, column, limit):
+        """Bitmap des recettes avec `column` <= limit ; exact si `limit` est une
+        borne, sinon sur-ensemble (bucket supérieur) à affiner via `refine`."""
+        for edge, bitmap in self.buckets[column]:
+            if limit <= edge:
+                return bitmap, limit != edge
+        return self._all, True
+
+    def match_at_least(self, ingredients_list, min_matches):
+        """Bitmap des recettes contenant au moins `min_matches` des ingrédients
+        (comptage bit-slicé : levels[k] = "au moins k+1 correspondances")."""
+        levels = [np.zeros_like(self._all) for _ in range(min_matches)]
+        for ingredient in {i.lower() for i in ingredients_list}:
+            bitmap = self.categories.get(ingredient)
+            if bitmap is None:
+                continue
+            for k in range(min_matches - 1, 0, -1):
+                levels[k] |= levels[k - 1] & bitmap
+            levels[0] |= bitmap
+        return levels[-1]
+
+    def query(self, ingredients_list=None, grades=None, max_minutes=None, max_calories=None,
+              max_ingredients=None, min_matches=3, match_bitmap=None):
+        """Positions (ordre du catalogue) des recettes satisfaisant tous les filtres
+        (`match_bitmap` : bitmap de correspondances déjà calculé, ex. par le cache)"""
+        bitmap = self._all.copy()
+        if match_bitmap is not None:
+            bitmap &= match_bitmap
+        elif ingredients_list and min_matches > 0:
+            bitmap &= self.match_at_least(ingredients_list, min_matches)
+        if grades:
+            grade_bitmap = np.zeros_like(bitmap)
+            for grade in grades:
+                if grade in self.grades:
+                    grade_bitmap |= self.grades[grade]
+            bitmap &= grade_bitmap
+
+        refine = []
+        for column, limit in (("minutes", max_minutes), ("calories", max_calories), ("n_ingredients", max_ingredients)):
+            if limit is not None:
+                column_bitmap, inexact = self._at_most(column, limit)
+                bitmap &= column_bitmap
+                if inexact:
+                    refine.append((column, limit))
+
+        positions = np.flatnonzero(np.unpackbits(bitmap, count=self.size))
+        for column, limit in refine:
+            positions = positions[self.values[column][positions] <= limit]
+        return positions
+
+    def category_matrix(self, positions, categories):
+        """Matrice booléenne (len(positions), len(categories)) : la recette contient la catégorie"""
+        return np.stack(
+            [np.unpackbits(self.categories[c], count=self.size)[positions].astype(bool) for c in categories],
+            axis=1,
+        )
+
+    def nbytes(self):
+        bitmaps = list(self.grades.values()) + list(self.categories.values())
+        bitmaps += [bitmap for buckets in self.buckets.values() for _, bitmap in buckets]
+        return sum(b.nbytes for b in bitmaps) + sum(v.nbytes for v in self.values.values())
@@ -1,17 +1,182 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 import requests
 from PIL import Image
 from io import BytesIO
+from helpers.recipe_index import RecipeIndex
+from helpers.recommendation_cache import RecommendationCache
+from helpers.budget_ranker import BudgetRanker, NUTRIENT_COLUMNS
+from helpers.meal_planner import optimize_plan
+from helpers.similar_recipes import SimilarRecipeIndex
+from helpers.recipes_db import ingredients_categories
+from helpers.list_columns import SERVED_COLUMNS, encode_catalog, load_list_columns
+from helpers.catalog import current_version, load_compact, release_memory, snapshot_paths, text_cache
+from helpers.cache import LRUCache
+from helpers.metrics import register_cache, timed
+
+# Intervalle minimal entre deux vérifications d'une nouvelle version publiée
+RELOAD_CHECK_SECONDS = 5.0
+
+# URLs d'images food.com déjà récupérées (None compris : page sans image), par id de recette
+IMAGE_URL_TTL = 24 * 3600  # secondes
+image_url_cache = LRUCache(maxsize=2048, ttl=IMAGE_URL_TTL)
+register_cache("image_url", image_url_cache.stats)
+_MISSING = object()
+
+
+class CatalogSnapshot:
+    """
+    Une version du catalogue (DataFrame compact, voir catalog.compact_frame) et ses
+    index dérivés, construits à la demande. Une requête prend le snapshot courant une
+    seule fois et l'utilise jusqu'au bout : une bascule pendant la requête ne
+    l'affecte pas.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.paths = snapshot_paths(version)
+        self.food_data = load_compact(self.paths["csv"])
+        self._lock = threading.RLock()
+        self._list_columns = None
+        self._recipe_index = None
+        self._recommendation_cache = None
+        self._budget_ranker = None
+        self._similar_index = None
+
+    def _lazy(self, attribute, build):
+        value = getattr(self, attribute)
+        if value is None:
+            with self._lock:
+                value = getattr(self, attribute)
+                if value is None:
+                    value = build()
+                    setattr(self, attribute, value)
+        return value
+
+    def list_columns(self):
+        """
+        Colonnes typées servies (`ingredients`, alignée sur food_data) écrites à
+        l'ingestion ; à défaut (fichier absent ou d'un autre catalogue), parsées une
+        seule fois depuis le CSV.
+        """
+        def build():
+            columns = load_list_columns(self.food_data["id"], self.paths["list_columns"], names=SERVED_COLUMNS)
+            if columns is None:
+                raw = pd.read_csv(self.paths["csv"], usecols=["id", *SERVED_COLUMNS])
+                columns = encode_catalog(raw, names=SERVED_COLUMNS)
+                del raw
+                release_memory()
+            return columns
+        return self._lazy("_list_columns", build)
+
+    def recipe_index(self):
+        return self._lazy("_recipe_index", lambda: RecipeIndex(
+            self.food_data, ingredients_categories, self.list_columns()["ingredients"]
+        ))
+
+    def recommendation_cache(self):
+        return self._lazy("_recommendation_cache", lambda: RecommendationCache(self.recipe_index()))
+
+    def budget_ranker(self):
+        return self._lazy("_budget_ranker", lambda: BudgetRanker(self.food_data))
+
+    def similar_index(self):
+        """Index MinHash/LSH de la version (None s'il n'a pas été construit)"""
+        index_dir = self.paths["lsh_index"]
+        if self._similar_index is None and not (index_dir / "signatures.npy").exists():
+            return None
+        return self._lazy("_similar_index", lambda: SimilarRecipeIndex(index_dir))
+
+    def warm(self):
+        """Construit tous les index : une version n'est servie qu'une fois prête"""
+        self.list_columns()
+        self.recommendation_cache()
+        self.budget_ranker()
+        self.similar_index()
+        return self
+
 
-# Load the CSV data containing recipes.
+_snapshot = CatalogSnapshot(current_version())
+_reloads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+_reload_lock = threading.Lock()
+_pending_version = None
+_failed_version = None
+_last_check = time.monotonic()
+# cache du snapshot servi (absent tant qu'aucune recherche n'a eu lieu)
+register_cache("recommendation", lambda: _snapshot._recommendation_cache.stats())
+
+
+def current_snapshot():
+    """
+    Snapshot servi. Au plus toutes les RELOAD_CHECK_SECONDS, regarde si une nouvelle
+    version a été publiée (`catalog.publish_snapshot`) et la charge en arrière-plan :
+    les requêtes continuent sur l'ancienne version jusqu'à la bascule.
+    """
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check >= RELOAD_CHECK_SECONDS:
+        _last_check = now
+        version = current_version()
+        if version != _snapshot.version and version != _failed_version:
+            reload_catalog()
+    return _snapshot
+
+
+def reload_catalog():
+    """Charge et préchauffe la version publiée puis bascule ; Future (None si déjà en cours)"""
+    global _pending_version
+    version = current_version()
+    with _reload_lock:
+        if _pending_version == version:
+            return None
+        _pending_version = version
+    return _reloads.submit(_load_and_swap, version)
+
+
+@timed("recipe_recommandation.reload")
+def _load_and_swap(version):
+    global _snapshot, _pending_version, _failed_version
+    try:
+        snapshot = CatalogSnapshot(version).warm()
+    except Exception:
+        _failed_version = version  # version illisible : on reste sur l'actuelle sans réessayer en boucle
+        raise
+    finally:
+        with _reload_lock:
+            _pending_version = None
+    _snapshot = snapshot  # affectation atomique : les requêtes en cours gardent leur référence
+    text_cache.invalidate()
+    return version
+
+
+def __getattr__(name):
+    # compatibilité : `recipe_recommandation.food_data` suit le snapshot courant
+    if name == "food_data":
+        return current_snapshot().food_data
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Recipes of the current catalog snapshot, in compact form (see catalog.compact_frame).
+# The stringified list columns are served already parsed by get_list_columns(),
+# long text (description, steps, tags) on demand by
+# catalog.recipe_text(ids, paths=current_snapshot().paths).
 def load_food_data():
-    return pd.read_csv(
-        "data/processed_recipes_with_categories.csv.gz",
-        compression="gzip"
-    )
+    return current_snapshot().food_data
+
+def get_list_columns():
+    """Colonnes typées du snapshot courant (voir `CatalogSnapshot.list_columns`)"""
+    return current_snapshot().list_columns()
 
-food_data = load_food_data()
+def recipe_ingredients(recipe_id):
+    """Ingrédients d'une recette, lus dans la colonne typée (liste vide si id inconnu)"""
+    snapshot = current_snapshot()
+    positions = np.flatnonzero(snapshot.food_data["id"].to_numpy() == int(recipe_id))
+    return snapshot.list_columns()["ingredients"][positions[0]] if len(positions) else []
 
 def get_primary_image_url(html_content):
     """
@@ -25,11 +190,17 @@ def get_primary_image_url(html_content):
             return img_tag['src']
     return None
 
+@timed()
 def get_food_image_url(food_id):
     """
     Given a food ID, this function finds the corresponding recipe name in the CSV data,
     constructs the URL for that recipe on Food.com, and then returns the primary image URL.
+    Results are kept in `image_url_cache`, so a rerun does not scrape the page again.
     """
+    cached = image_url_cache.get(food_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    food_data = current_snapshot().food_data
     try:
         food_name = food_data.loc[food_data['id'] == food_id, 'name'].values[0]
     except IndexError:
@@ -37,13 +208,16 @@ def get_food_image_url(food_id):
 
     # Construct the URL based on the recipe name and id.
     url = "https://www.food.com/recipe/" + str(food_name).replace(" ", "-") + "-" + str(food_id)
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        image_url = get_primary_image_url(response.text)
-        return image_url
-    else:
-        return None
+    try:
+        response = requests.get(url, timeout=10)
+    except requests.RequestException:
+        return None  # erreur réseau : pas mise en cache, on réessaiera
+    if response.status_code not in (200, 404):
+        return None  # erreur transitoire du site : idem
+
+    image_url = get_primary_image_url(response.text) if response.status_code == 200 else None
+    image_url_cache.set(food_id, image_url)
+    return image_url
 
 def show_food_image(food_id):
     """
@@ -57,6 +231,7 @@ def show_food_image(food_id):
     else:
         print("Impossible de récupérer l'image pour l'ID:", food_id)
 
+@timed()
 def propose_recipes(ingredients_list):
     """
     Returns recipes from the CSV that contain at least 3 matching ingredients.
@@ -64,12 +239,126 @@ def propose_recipes(ingredients_list):
     """
     # Normalize user-selected ingredients.
     ingredients_list = [ingredient.lower() for ingredient in ingredients_list]
-    
-    def count_matching_ingredients(recipe_ingredients):
-        # 'recipe_ingredients' is expected to be a string (from the CSV).
-        return sum(1 for ingredient in ingredients_list if ingredient in recipe_ingredients)
-    
+    snapshot = current_snapshot()
+    food_data = snapshot.food_data
+    ingredients = snapshot.list_columns()["ingredients"]
+
+    # An ingredient matches a recipe when it appears in one of its (encoded) ingredients:
+    # the substring test runs on the vocabulary, not on every recipe string.
+    matches = np.zeros(len(food_data), dtype=np.int32)
+    for ingredient in ingredients_list:
+        matches += ingredients.rows_containing(ingredients.token_mask(lambda token: ingredient in token))
+
     # Filter recipes: here we require at least 3 matching ingredients.
-    matching_recipes = food_data[food_data['ingredients'].apply(lambda x: count_matching_ingredients(x.lower())) >= 3]
+    matching_recipes = food_data[matches >= 3]
     
     return matching_recipes
+
+
+def get_recipe_index():
+    """Index bitmap sur le catalogue courant, construit au premier appel"""
+    return current_snapshot().recipe_index()
+
+def get_recommendation_cache():
+    """Cache des correspondances par ensemble d'ingrédients (voir `RecommendationCache.stats`)"""
+    return current_snapshot().recommendation_cache()
+
+def _query_positions(snapshot, ingredients_list, grades, max_minutes, max_calories, max_ingredients, min_matches):
+    match_bitmap = None
+    if ingredients_list and min_matches > 0:
+        match_bitmap = snapshot.recommendation_cache().match_at_least(ingredients_list, min_matches)
+    return snapshot.recipe_index().query(
+        ingredients_list, grades, max_minutes, max_calories, max_ingredients, min_matches, match_bitmap
+    )
+
+@timed()
+def find_recipes(ingredients_list=None, grades=None, max_minutes=None, max_calories=None,
+                 max_ingredients=None, min_matches=3, limit=None):
+    """
+    Recettes filtrées par ingrédients (au moins `min_matches` correspondances), grades
+    (ex. ["A", "B"]), temps de cuisson, calories et nombre d'ingrédients maximum.
+    Les filtres sont intersectés sur les bitmaps de l'index avant de matérialiser
+    les `limit` premières lignes (ordre du catalogue).
+    """
+    snapshot = current_snapshot()
+    positions = _query_positions(snapshot, ingredients_list, grades, max_minutes, max_calories, max_ingredients, min_matches)
+    if limit is not None:
+        positions = positions[:limit]
+    return snapshot.food_data.iloc[positions]
+
+def get_budget_ranker():
+    """Matrice nutritionnelle du catalogue courant pour le classement par budget"""
+    return current_snapshot().budget_ranker()
+
+@timed()
+def recommend_for_budget(budget, ingredients_list=None, grades=None, max_minutes=None, max_calories=None,
+                         max_ingredients=None, min_matches=3, limit=10, meals_left=1):
+    """
+    Comme `find_recipes`, mais les candidats sont classés selon leur adéquation au
+    budget restant (`budget_ranker.remaining_budget`) au lieu de l'ordre du catalogue.
+    """
+    snapshot = current_snapshot()
+    positions = _query_positions(snapshot, ingredients_list, grades, max_minutes, max_calories, max_ingredients, min_matches)
+    best = snapshot.budget_ranker().top_k(budget, limit, meals_left, positions)
+    return snapshot.food_data.iloc[best]
+
+@timed()
+def similar_recipes(recipe_id, k=5):
+    """
+    Recettes aux ingrédients les plus proches de `recipe_id` (index MinHash/LSH
+    construit par `python helpers/similar_recipes.py build` ou à la publication du
+    catalogue) ; vide si l'index n'existe pas.
+    """
+    snapshot = current_snapshot()
+    index = snapshot.similar_index()
+    if index is None:
+        return snapshot.food_data.iloc[[]]
+    return _rows_by_ids(snapshot.food_data, [similar_id for similar_id, _ in index.similar(recipe_id, k)])
+
+@timed()
+def recipes_by_ids(recipe_ids):
+    """Lignes du catalogue courant pour `recipe_ids`, dans l'ordre donné"""
+    return _rows_by_ids(current_snapshot().food_data, recipe_ids)
+
+def _rows_by_ids(food_data, recipe_ids):
+    order = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+    rows = food_data[food_data["id"].isin(order)]
+    return rows.iloc[rows["id"].map(order).argsort()]
+
+@timed()
+def plan_meals(tdee, fridge_ingredients=None, days=7, meals_per_day=3, grades=None,
+               max_minutes=None, pool_size=400, time_limit=0.5):
+    """
+    Plan de repas sur `days` jours : maximise le nutriscore et l'utilisation des
+    ingrédients du frigo, calories journalières proches du TDEE et PDV sous 100%.
+    Les PDV sous 100% sont un objectif pénalisé (au carré du dépassement), pas une
+    contrainte stricte : un jour peut dépasser si aucun plan ne tient.
+    Le pool de candidats est d'abord réduit par l'index bitmap (filtres, au moins un
+    ingrédient du frigo si fourni) puis par le classement au budget d'un repas.
+    Si les filtres laissent trop peu de recettes distinctes, le plan est raccourci
+    (ValueError s'il n'y en a pas assez pour un seul jour).
+    Renvoie un DataFrame (day, meal + colonnes de la recette).
+    """
+    snapshot = current_snapshot()
+    food_data = snapshot.food_data
+    index = snapshot.recipe_index()
+    positions = _query_positions(snapshot, fridge_ingredients, grades, max_minutes, None, None, 1)
+    if len(positions) < days * meals_per_day:
+        # pas assez de recettes avec le frigo : on relâche la contrainte d'ingrédients
+        positions = index.query(None, grades, max_minutes)
+    budget = np.array([tdee] + [100.0] * (len(NUTRIENT_COLUMNS) - 1), dtype=np.float32)
+    pool = snapshot.budget_ranker().top_k(budget, pool_size, meals_per_day, positions)
+    days = min(days, len(pool) // meals_per_day)
+    if days == 0:
+        raise ValueError(f"only {len(pool)} recipes match the filters, not enough for {meals_per_day} meals")
+
+    fridge = np.array([c in set(fridge_ingredients or []) for c in ingredients_categories])
+    nutrients = food_data[NUTRIENT_COLUMNS].to_numpy(dtype=np.float64)[pool]
+    nutriscore = food_data["nutriscore"].to_numpy(dtype=np.float64)[pool]
+    categories = index.category_matrix(pool, ingredients_categories)
+
+    plan = optimize_plan(nutrients, nutriscore, categories, fridge, tdee, days, meals_per_day, time_limit)
+    meals = food_data.iloc[pool[plan.ravel()]].copy()
+    meals.insert(0, "meal", np.tile(np.arange(1, meals_per_day + 1), days))
+    meals.insert(0, "day", np.repeat(np.arange(1, days + 1), meals_per_day))
+    return meals
@@ -0,0 +1,352 @@
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from helpers.metrics import connect, timed
+
+RECIPES_DB = Path(__file__).parent.parent / "recipes.db"
+CATALOG_CSV = "data/processed_recipes_with_categories.csv.gz"
+
+# Les 30 catégories reconnues par YOLO / proposées dans la page Alimentation
+ingredients_categories = [
+    "apple", "banana", "beef", "blueberries", "bread", "butter", "carrot", "cheese", "chicken", "chicken_breast",
+    "chocolate", "corn", "eggs", "flour", "goat_cheese", "green_beans", "ground_beef", "ham", "heavy_cream",
+    "lime", "milk", "mushrooms", "onion", "potato", "shrimp", "spinach", "strawberries", "sugar", "sweet_potato", "tomato"
+]
+
+PDV_COLUMNS = ["total_fat_PDV", "sugar_PDV", "sodium_PDV", "protein_PDV", "saturated_fat_PDV", "carbohydrates_PDV"]
+
+# Schéma normalisé : `recipes` garde les colonnes servies par la page Alimentation
+# (rank = position dans le catalogue trié par nutriscore), `recipe_ingredient`
+# relie chaque recette aux catégories présentes dans ses ingrédients.
+# (fridge_contents et user_recommendations sont gérées par helpers/fridge.py)
+SCHEMA = """
+DROP TABLE IF EXISTS recipes_fts;
+DROP TABLE IF EXISTS recipe_ingredient;
+DROP TABLE IF EXISTS recipes;
+DROP TABLE IF EXISTS ingredients;
+DROP TABLE IF EXISTS catalog_meta;
+
+-- Version du catalogue chargée (voir catalog.publish_snapshot ; absente = data/)
+CREATE TABLE catalog_meta (
+    key VARCHAR PRIMARY KEY,
+    value VARCHAR
+);
+
+CREATE TABLE recipes (
+    id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    name VARCHAR,
+    description VARCHAR,
+    instructions VARCHAR,
+    minutes INTEGER,
+    n_ingredients INTEGER,
+    ingredients VARCHAR,
+    ingredients_list VARCHAR,
+    calories FLOAT,
+    total_fat_PDV FLOAT,
+    sugar_PDV FLOAT,
+    sodium_PDV FLOAT,
+    protein_PDV FLOAT,
+    saturated_fat_PDV FLOAT,
+    carbohydrates_PDV FLOAT,
+    protein FLOAT,
+    carbs FLOAT,
+    fat FLOAT,
+    nutriscore FLOAT,
+    grade VARCHAR(1),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE ingredients (
+    id INTEGER NOT NULL,
+    name VARCHAR,
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+
+CREATE TABLE recipe_ingredient (
+    recipe_id INTEGER,
+    ingredient_id INTEGER,
+    FOREIGN KEY(recipe_id) REFERENCES recipes (id),
+    FOREIGN KEY(ingredient_id) REFERENCES ingredients (id)
+);
+
+"""
+
+# Tables du catalogue, dans l'ordre de suppression (fridge_contents et
+# user_recommendations, dans la même base, ne sont jamais touchées par un rechargement)
+CATALOG_TABLES = ["recipes_fts", "recipe_ingredient", "recipes", "ingredients", "catalog_meta"]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_recipe_ingredient_ingredient ON recipe_ingredient (ingredient_id, recipe_id);
+CREATE INDEX IF NOT EXISTS idx_recipes_rank ON recipes (rank);
+"""
+
+# Index plein texte (FTS5, contenu externe = table recipes) sur nom, description et ingrédients
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE recipes_fts USING fts5(
+    name, description, ingredients,
+    content='recipes', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild');
+INSERT INTO recipes_fts (recipes_fts) VALUES ('optimize');
+"""
+
+# Poids bm25 par colonne : un terme dans le nom compte plus que dans la description
+FTS_WEIGHTS = (10.0, 1.0, 4.0)
+
+
+def _recipe_rows(chunk):
+    """Convertit un chunk du catalogue en lignes pour `recipes` (rank = position dans le CSV)"""
+    for rank, row in zip(chunk.index, chunk.itertuples(index=False)):
+        yield (
+            int(row.id), int(rank), row.name, row.description, row.steps, row.minutes, row.n_ingredients,
+            row.ingredients, row.ingredients_list, row.calories,
+            row.total_fat_PDV, row.sugar_PDV, row.sodium_PDV, row.protein_PDV,
+            row.saturated_fat_PDV, row.carbohydrates_PDV,
+            row.protein, row.carbohydrates_PDV * 260 / 100, row.total_fat,  # carbs en g (260 g/jour)
+            row.nutriscore, row.grade,
+        )
+
+
+def _link_rows(chunk, ingredient_ids):
+    """Même règle que `recipe_recommandation.propose_recipes` : la catégorie
+    apparaît (sous-chaîne) dans la liste d'ingrédients en minuscules."""
+    for recipe_id, ingredients in zip(chunk["id"], chunk["ingredients"].fillna("").str.lower()):
+        for name, ingredient_id in ingredient_ids.items():
+            if name in ingredients:
+                yield int(recipe_id), ingredient_id
+
+
+def _replace_catalog(tmp_path, db_path):
+    """
+    Remplace les tables du catalogue de `db_path` par celles de la base `tmp_path`, en
+    une seule transaction sur la base en service : les lecteurs voient l'ancien ou le
+    nouveau catalogue, et les écritures du frigo attendent le commit au lieu d'être
+    perdues (pas de fichier renommé sous une connexion ouverte). Index, FTS et
+    statistiques sont reconstruits dans la même transaction.
+    """
+    conn = connect(db_path, timeout=30)
+    try:
+        conn.execute("ATTACH DATABASE ? AS fresh", (str(tmp_path),))
+        tables = conn.execute(
+            "SELECT name, sql FROM fresh.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name in CATALOG_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS main.{name}")
+            for name, sql in tables:
+                conn.execute(sql)
+                conn.execute(f"INSERT INTO main.{name} SELECT * FROM fresh.{name}")
+            for script in (INDEXES, FTS_SCHEMA):
+                for statement in filter(str.strip, script.split(";")):
+                    conn.execute(statement)
+            conn.execute("ANALYZE main")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.execute("DETACH DATABASE fresh")
+    finally:
+        conn.close()
+
+
+def load_recipes_db(csv_path=CATALOG_CSV, db_path=RECIPES_DB, chunksize=20000, version=None):
+    """
+    Remplit recipes.db depuis le catalogue traité (recharge complète) et enregistre la
+    `version` du catalogue chargée (None : catalogue non publié de data/). Le CSV est
+    lu dans une base temporaire (sans journal : un crash ne laisse qu'un fichier à
+    jeter), recopiée ensuite dans recipes.db en une transaction (`_replace_catalog`) ;
+    l'app lit l'ancien catalogue jusqu'au commit.
+    Les ids en double gardent leur première occurrence (et ses seuls liens).
+    """
+    tmp_path = Path(f"{db_path}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = connect(tmp_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+
+    conn.executemany(
+        "INSERT INTO ingredients (id, name) VALUES (?, ?)",
+        list(enumerate(ingredients_categories, start=1)),
+    )
+    ingredient_ids = {name: i for i, name in enumerate(ingredients_categories, start=1)}
+    if version is not None:
+        conn.execute("INSERT INTO catalog_meta (key, value) VALUES ('version', ?)", (version,))
+
+    n_recipes = n_links = 0
+    seen = set()
+    with conn:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = chunk[~chunk["id"].duplicated() & ~chunk["id"].isin(seen)]
+            seen.update(chunk["id"].tolist())
+            conn.executemany(
+                "INSERT INTO recipes VALUES (" + ", ".join(["?"] * 21) + ")",
+                _recipe_rows(chunk),
+            )
+            links = list(_link_rows(chunk, ingredient_ids))
+            conn.executemany("INSERT INTO recipe_ingredient (recipe_id, ingredient_id) VALUES (?, ?)", links)
+            n_recipes += len(chunk)
+            n_links += len(links)
+
+    conn.close()
+    # Index et FTS créés après l'insertion en masse, pendant la recopie
+    try:
+        _replace_catalog(tmp_path, db_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return n_recipes, n_links
+
+
+def is_populated(db_path=RECIPES_DB):
+    """Vrai si recipes.db contient un catalogue chargé par `load_recipes_db`"""
+    try:
+        conn = connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT 1 FROM recipes WHERE rank IS NOT NULL LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+def serves_version(version, db_path=RECIPES_DB):
+    """
+    Vrai si recipes.db est chargé avec la version `version` du catalogue : les requêtes
+    SQL et FTS donnent alors les mêmes recettes que le catalogue servi en mémoire.
+    """
+    if not is_populated(db_path):
+        return False
+    conn = connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    except sqlite3.OperationalError:  # base chargée avant l'ajout de catalog_meta
+        row = None
+    finally:
+        conn.close()
+    return (row[0] if row else None) == version
+
+
+@timed()
+def propose_recipes(ingredients_list, min_matches=3, limit=None, filters=None, db_path=RECIPES_DB):
+    """
+    Variante SQL de `recipe_recommandation.propose_recipes` : recettes contenant au moins
+    `min_matches` des ingrédients donnés, dans l'ordre du catalogue (meilleur nutriscore
+    d'abord), sans charger le catalogue en mémoire. `filters` : voir `search_recipes`.
+    """
+    names = sorted({ingredient.lower() for ingredient in ingredients_list})
+    if not names:
+        return pd.DataFrame()
+    placeholders = ", ".join(["?"] * len(names))
+    clauses, filter_params = _filter_clauses(filters)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    query = f"""
+    SELECT r.*, m.matches
+    FROM (
+        SELECT ri.recipe_id, COUNT(*) AS matches
+        FROM recipe_ingredient ri
+        JOIN ingredients i ON i.id = ri.ingredient_id
+        WHERE i.name IN ({placeholders})
+        GROUP BY ri.recipe_id
+        HAVING COUNT(*) >= ?
+    ) m
+    JOIN recipes r ON r.id = m.recipe_id{where}
+    ORDER BY r.rank
+    """
+    params = names + [min_matches] + filter_params
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    conn = connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def to_fts_query(text):
+    """
+    Convertit une recherche libre en requête FTS5 : les "phrases entre guillemets"
+    et les préfixes (chick*) sont conservés, les autres mots sont cités pour
+    neutraliser la syntaxe FTS5 (AND implicite entre les termes).
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+            continue
+        prefix = word.endswith("*")
+        word = re.sub(r"[^\w'-]", "", word).replace("'", " ")
+        if word:
+            terms.append('"' + word + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _filter_clauses(filters):
+    """Clauses SQL (sur l'alias r de recipes) pour les filtres grade/minutes/calories"""
+    clauses, params = [], []
+    filters = filters or {}
+    if filters.get("grades"):
+        clauses.append(f"r.grade IN ({', '.join(['?'] * len(filters['grades']))})")
+        params.extend(filters["grades"])
+    for key, column, op in (
+        ("max_minutes", "minutes", "<="),
+        ("max_calories", "calories", "<="),
+        ("min_calories", "calories", ">="),
+        ("max_ingredients", "n_ingredients", "<="),
+    ):
+        if filters.get(key) is not None:
+            clauses.append(f"r.{column} {op} ?")
+            params.append(filters[key])
+    return clauses, params
+
+
+@timed()
+def search_recipes(query, filters=None, limit=20, order_by="relevance", db_path=RECIPES_DB):
+    """
+    Recherche plein texte classée (bm25) sur nom, description et ingrédients.
+
+    `filters` : dict optionnel avec `grades` (ex. ["A", "B"]), `max_minutes`,
+    `min_calories`, `max_calories`, `max_ingredients`.
+    `order_by` : "relevance" (bm25 puis nutriscore) ou "nutriscore" (nutriscore puis bm25).
+    """
+    fts_query = to_fts_query(query)
+    if not fts_query:
+        return pd.DataFrame()
+    clauses, params = _filter_clauses(filters)
+    where = "".join(" AND " + clause for clause in clauses)
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    order = "relevance, r.nutriscore" if order_by == "relevance" else "r.nutriscore, relevance"
+    sql = f"""
+    SELECT r.*, bm25(recipes_fts, {weights}) AS relevance
+    FROM recipes_fts
+    JOIN recipes r ON r.id = recipes_fts.rowid
+    WHERE recipes_fts MATCH ?{where}
+    ORDER BY {order}
+    LIMIT ?
+    """
+    conn = connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(sql, conn, params=[fts_query] + params + [int(limit)])
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # par défaut : le CSV de la version publiée courante (ou celui de data/)
+    from helpers.catalog import current_version, snapshot_paths
+    version = current_version()
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else snapshot_paths(version)["csv"]
+    start = time.perf_counter()
+    n_recipes, n_links = load_recipes_db(csv_path, version=version if len(sys.argv) <= 1 else None)
+    print(f"Loaded {n_recipes} recipes and {n_links} recipe/ingredient links into {RECIPES_DB} "
+          f"in {time.perf_counter() - start:.1f}s")
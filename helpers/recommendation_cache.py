@@ -0,0 +1,118 @@
+import threading
+import time
+
+import numpy as np
+
+from helpers.cache import LRUCache
+
+# Nombre de bits du compteur de correspondances (30 catégories -> 5 bits)
+COUNTER_BITS = 5
+
+
+def _add(counter, bitmap):
+    """counter += bitmap (addition bit-slicée, propagation de la retenue)"""
+    carry = bitmap
+    for i in range(len(counter)):
+        counter[i], carry = counter[i] ^ carry, counter[i] & carry
+
+
+def _subtract(counter, bitmap):
+    """counter -= bitmap (soustraction bit-slicée, propagation de l'emprunt)"""
+    borrow = bitmap
+    for i in range(len(counter)):
+        counter[i], borrow = counter[i] ^ borrow, ~counter[i] & borrow
+
+
+def at_least(counter, threshold):
+    """Bitmap des recettes dont le compteur est >= threshold (comparaison bit-slicée)"""
+    greater = np.zeros_like(counter[0])
+    equal = np.full_like(counter[0], 0xFF)
+    for i in reversed(range(len(counter))):
+        if (threshold >> i) & 1:
+            equal &= counter[i]
+        else:
+            greater |= equal & counter[i]
+            equal &= ~counter[i]
+    return greater | equal
+
+
+class RecommendationCache:
+    """
+    Cache LRU des comptes de correspondances par ensemble d'ingrédients normalisé.
+
+    La valeur est un compteur bit-slicé (COUNTER_BITS bitmaps) : nombre d'ingrédients
+    de l'ensemble présents dans chaque recette. Quand l'ensemble demandé diffère d'un
+    seul ingrédient d'un ensemble en cache (ajout ou retrait dans le multiselect), le
+    compteur est dérivé par une addition/soustraction du bitmap de cet ingrédient au
+    lieu d'être recalculé.
+    """
+
+    def __init__(self, recipe_index, maxsize=64):
+        self.index = recipe_index
+        self.cache = LRUCache(maxsize=maxsize)
+        self.counts = {"hit": 0, "derived": 0, "miss": 0}
+        self.seconds = {"hit": 0.0, "derived": 0.0, "miss": 0.0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(ingredients_list):
+        return frozenset(i.lower() for i in ingredients_list or [])
+
+    def _bitmap(self, ingredient):
+        bitmap = self.index.categories.get(ingredient)
+        return bitmap if bitmap is not None else self.index.empty_bitmap()
+
+    def _neighbour(self, key):
+        """(ensemble, compteur) en cache à un ingrédient près de `key` (ajout ou retrait)"""
+        for cached in reversed(self.cache.keys()):
+            if len(cached ^ key) == 1:
+                counter = self.cache.peek(cached)  # sonde : ne fausse pas les stats du cache
+                if counter is not None:
+                    return cached, counter
+        return None, None
+
+    def counter(self, ingredients_list):
+        """Compteur bit-slicé pour l'ensemble d'ingrédients (en cache, dérivé ou calculé)"""
+        start = time.perf_counter()
+        key = self.normalize(ingredients_list)
+        counter = self.cache.get(key)
+        if counter is not None:
+            kind = "hit"
+        else:
+            neighbour, neighbour_counter = self._neighbour(key)
+            if neighbour is not None:
+                kind = "derived"
+                counter = [bits.copy() for bits in neighbour_counter]
+                (changed,) = neighbour ^ key
+                if changed in key:
+                    _add(counter, self._bitmap(changed))
+                else:
+                    _subtract(counter, self._bitmap(changed))
+            else:
+                kind = "miss"
+                counter = [self.index.empty_bitmap() for _ in range(COUNTER_BITS)]
+                for ingredient in key:
+                    _add(counter, self._bitmap(ingredient))
+            self.cache.set(key, counter)
+        with self._lock:
+            self.counts[kind] += 1
+            self.seconds[kind] += time.perf_counter() - start
+        return counter
+
+    def match_at_least(self, ingredients_list, min_matches):
+        """Bitmap des recettes contenant au moins `min_matches` des ingrédients"""
+        return at_least(self.counter(ingredients_list), min_matches)
+
+    def stats(self):
+        """Hits exacts, résultats dérivés d'un voisin, recalculs et temps moyen (ms) par type"""
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                **self.counts,
+                "hit_rate": (self.counts["hit"] + self.counts["derived"]) / total if total else 0.0,
+                "avg_ms": {
+                    kind: 1000 * self.seconds[kind] / count if count else 0.0
+                    for kind, count in self.counts.items()
+                },
+                "size": len(self.cache),
+            }
@@ -1,44 +1,208 @@
+import argparse
+import math
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# Load processed dataset
 file_path = "data/processed_recipes.csv"
-df = pd.read_csv(file_path)
+analysis_file = "data/nutriscore_analysis.txt"
+charts_dir = "data/reports"
 
-# Drop rows with missing scores/grades
-df = df.dropna(subset=["nutriscore", "grade"])
+GRADES = ["A", "B", "C", "D", "E"]
+GRADE_COLORS = ["green", "lightgreen", "yellow", "orange", "red"]
 
-# Convert Nutri-Score to integer (if needed)
-df["nutriscore"] = df["nutriscore"].astype(int)
 
-# --- Basic statistics ---
-print("Nutri-Score Statistics:")
-print(df["nutriscore"].describe())
+class RunningStats:
+    """count / moyenne / écart-type / min / max en une passe (Welford par lots, fusionnable)"""
 
-# --- Distribution of Nutri-Scores ---
-plt.figure(figsize=(10, 5))
-sns.histplot(df["nutriscore"], bins=20, kde=True, color="skyblue")
-plt.xlabel("Nutri-Score")
-plt.ylabel("Count")
-plt.title("Distribution of Nutri-Scores")
-plt.grid()
-plt.show()
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
 
-# --- Grade Distribution ---
-grade_counts = df["grade"].value_counts()
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            batch = RunningStats()
+            batch.count, batch.mean = len(values), float(values.mean())
+            batch.m2 = float(((values - batch.mean) ** 2).sum())
+            batch.min, batch.max = float(values.min()), float(values.max())
+            self.merge(batch)
 
-plt.figure(figsize=(6, 6))
-plt.pie(grade_counts, labels=grade_counts.index, autopct="%1.1f%%", colors=["green", "lightgreen", "yellow", "orange", "red"])
-plt.title("Grade Distribution")
-plt.show()
+    def merge(self, other):
+        """Combine deux accumulateurs (formule de Chan et al.)"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
 
-# --- Save results ---
-analysis_file = "data/nutriscore_analysis.txt"
-with open(analysis_file, "w") as f:
-    f.write("Nutri-Score Statistics:\n")
-    f.write(str(df["nutriscore"].describe()) + "\n\n")
-    f.write("Grade Distribution:\n")
-    f.write(str(grade_counts) + "\n")
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+
+class QuantileSketch:
+    """
+    Sketch de quantiles à erreur relative bornée (type DDSketch) : chaque valeur tombe
+    dans un bucket logarithmique de largeur relative `relative_accuracy`. Mémoire
+    bornée par le nombre de buckets (pas par le nombre de lignes) ; deux sketchs se
+    fusionnent en additionnant leurs buckets.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zero = 0
+        self.count = 0
+
+    def _keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        for store, selected in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            keys, counts = np.unique(self._keys(selected), return_counts=True)
+            store.update(dict(zip(keys.tolist(), counts.tolist())))
+        self.zero += int((values == 0).sum())
+        self.count += len(values)
+
+    def merge(self, other):
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+
+def stream_analysis(path=file_path, chunksize=100_000):
+    """
+    Une seule passe par chunks sur le catalogue traité : statistiques du Nutri-Score
+    (accumulateurs en ligne + sketch de quantiles), nombre de recettes par grade et
+    histogramme des scores. Mémoire bornée quelle que soit la taille du fichier.
+    """
+    stats, sketch = RunningStats(), QuantileSketch()
+    grade_counts, score_counts = Counter(), Counter()
+    for chunk in pd.read_csv(path, usecols=["nutriscore", "grade"], chunksize=chunksize):
+        # Drop rows with missing scores/grades
+        chunk = chunk.dropna(subset=["nutriscore", "grade"])
+        scores = chunk["nutriscore"].to_numpy().astype(int)
+        stats.update(scores)
+        sketch.add(scores)
+        grade_counts.update(chunk["grade"].tolist())
+        values, counts = np.unique(scores, return_counts=True)
+        score_counts.update(dict(zip(values.tolist(), counts.tolist())))
+    return stats, sketch, grade_counts, score_counts
+
+
+def describe(stats, sketch):
+    """Même présentation que `Series.describe()` (quantiles estimés par le sketch, bornés par min/max)"""
+    quantiles = {f"{int(q * 100)}%": min(max(sketch.quantile(q), stats.min), stats.max) for q in (0.25, 0.5, 0.75)}
+    return pd.Series(
+        {"count": stats.count, "mean": stats.mean, "std": stats.std, "min": stats.min, **quantiles, "max": stats.max},
+        name="nutriscore", dtype=float,
+    )
+
+
+def grade_series(grade_counts):
+    counts = pd.Series(grade_counts, name="count", dtype=int).sort_values(ascending=False)
+    counts.index.name = "grade"
+    return counts
+
+
+def write_analysis(stats, grade_counts, path=analysis_file):
+    with open(path, "w") as f:
+        f.write("Nutri-Score Statistics:\n")
+        f.write(str(stats) + "\n\n")
+        f.write("Grade Distribution:\n")
+        f.write(str(grade_counts) + "\n")
+
+
+def save_charts(score_counts, grade_counts, out_dir=charts_dir):
+    """Histogramme des scores et camembert des grades en PNG (backend Agg, sans affichage)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scores = np.array(sorted(score_counts))
+    counts = np.array([score_counts[s] for s in scores])
+
+    # --- Distribution of Nutri-Scores ---
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.hist(scores, bins=20, weights=counts, color="skyblue", edgecolor="white")
+    ax.set_xlabel("Nutri-Score")
+    ax.set_ylabel("Count")
+    ax.set_title("Distribution of Nutri-Scores")
+    ax.grid()
+    fig.savefig(out_dir / "nutriscore_distribution.png", bbox_inches="tight")
+    plt.close(fig)
+
+    # --- Grade Distribution ---
+    grades = [g for g in GRADES if grade_counts.get(g)]
+    fig, ax = plt.subplots(figsize=(6, 6))
+    ax.pie([grade_counts[g] for g in grades], labels=grades, autopct="%1.1f%%",
+           colors=[GRADE_COLORS[GRADES.index(g)] for g in grades])
+    ax.set_title("Grade Distribution")
+    fig.savefig(out_dir / "grade_distribution.png", bbox_inches="tight")
+    plt.close(fig)
+    return [out_dir / "nutriscore_distribution.png", out_dir / "grade_distribution.png"]
+
+
+def run_report(path=file_path, output=analysis_file, out_dir=charts_dir, charts=True, chunksize=100_000):
+    """Analyse en streaming + rapport texte (+ graphiques PNG) ; renvoie le nombre de recettes analysées"""
+    stats, sketch, grade_counts, score_counts = stream_analysis(path, chunksize)
+    write_analysis(describe(stats, sketch), grade_series(grade_counts), output)
+    if charts:
+        save_charts(score_counts, grade_counts, out_dir)
+    return stats.count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nutri-Score report (single streaming pass, headless charts)")
+    parser.add_argument("csv", nargs="?", default=file_path)
+    parser.add_argument("--output", default=analysis_file)
+    parser.add_argument("--charts-dir", default=charts_dir)
+    parser.add_argument("--no-charts", action="store_true")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    n = run_report(args.csv, args.output, args.charts_dir, not args.no_charts, args.chunksize)
 
-print(f"Analysis saved to {analysis_file}")
+    # --- Basic statistics ---
+    print(Path(args.output).read_text())
+    print(f"Analysis of {n} recipes saved to {args.output}"
+          + ("" if args.no_charts else f", charts in {args.charts_dir}"))
@@ -0,0 +1,184 @@
+import ast
+import json
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATALOG_CSV = "data/processed_recipes_with_categories.csv.gz"
+INDEX_DIR = Path(__file__).parent.parent / "data" / "lsh_index"
+
+NUM_PERM = 64            # taille de la signature MinHash
+BANDS = 16               # LSH : 16 bandes de 4 lignes -> seuil ~ (1/16)^(1/4) = 0.5
+ROWS = NUM_PERM // BANDS
+PRIME = np.uint64(4294967311)   # premier > 2^32
+SEED = 42
+
+
+def parse_ingredients(value):
+    """"['a', 'b']" -> {"a", "b"} (ingrédients normalisés)"""
+    try:
+        items = ast.literal_eval(value) if isinstance(value, str) else []
+    except (ValueError, SyntaxError):
+        items = str(value).strip("[]").split(",")
+    return {str(item).strip(" '\"").lower() for item in items if str(item).strip(" '\"")}
+
+
+def _permutations():
+    rng = np.random.default_rng(SEED)
+    a = rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+    return a, b
+
+
+def _token_hashes(tokens):
+    return np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.uint64)
+
+
+def minhash(ingredient_sets):
+    """Signatures MinHash (len(ingredient_sets) x NUM_PERM, uint32) ; ensembles vides -> max"""
+    a, b = _permutations()
+    lengths = np.array([len(s) for s in ingredient_sets])
+    signatures = np.full((len(ingredient_sets), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    nonempty = np.flatnonzero(lengths)
+    if len(nonempty) == 0:
+        return signatures
+    tokens = _token_hashes([t for i in nonempty for t in ingredient_sets[i]])
+    hashed = ((a[:, None] * tokens[None, :] + b[:, None]) % PRIME) & np.uint64(0xFFFFFFFF)
+    offsets = np.concatenate([[0], np.cumsum(lengths[nonempty])[:-1]])
+    signatures[nonempty] = np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+    return signatures
+
+
+def _band_keys(signatures):
+    """Une clé uint64 par (bande, recette) combinant les ROWS valeurs de la bande"""
+    sig = signatures.astype(np.uint64).reshape(len(signatures), BANDS, ROWS)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    for r in range(ROWS):
+        keys = (keys * np.uint64(1099511628211)) ^ sig[:, :, r]  # FNV-like, débordement voulu
+    return keys.T
+
+
+def build_index(csv_path=CATALOG_CSV, out_dir=INDEX_DIR, chunksize=10000):
+    """Calcule les signatures et les bandes LSH triées, et les écrit en .npy dans `out_dir`"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ids, signatures = [], []
+    for chunk in pd.read_csv(csv_path, usecols=["id", "ingredients"], chunksize=chunksize):
+        sets = [parse_ingredients(value) for value in chunk["ingredients"]]
+        signatures.append(minhash(sets))
+        ids.append(chunk["id"].to_numpy(dtype=np.int64))
+    ids = np.concatenate(ids)
+    signatures = np.concatenate(signatures)
+
+    valid = np.flatnonzero(signatures[:, 0] != np.iinfo(np.uint32).max)
+    keys = _band_keys(signatures[valid])
+    order = np.argsort(keys, axis=1, kind="stable")
+    band_keys = np.take_along_axis(keys, order, axis=1)
+    band_positions = valid[order].astype(np.int32)
+
+    np.save(out_dir / "ids.npy", ids)
+    np.save(out_dir / "signatures.npy", signatures)
+    np.save(out_dir / "band_keys.npy", band_keys)
+    np.save(out_dir / "band_positions.npy", band_positions)
+    with open(out_dir / "meta.json", "w") as f:
+        json.dump({"num_perm": NUM_PERM, "bands": BANDS, "seed": SEED, "recipes": len(ids)}, f)
+    return len(ids)
+
+
+class SimilarRecipeIndex:
+    """Index MinHash/LSH chargé en memory-map (aucune copie en RAM au chargement)"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        index_dir = Path(index_dir)
+        self.ids = np.load(index_dir / "ids.npy", mmap_mode="r")
+        self.signatures = np.load(index_dir / "signatures.npy", mmap_mode="r")
+        self.band_keys = np.load(index_dir / "band_keys.npy", mmap_mode="r")
+        self.band_positions = np.load(index_dir / "band_positions.npy", mmap_mode="r")
+        self._position_by_id = None
+
+    def position(self, recipe_id):
+        if self._position_by_id is None:
+            self._position_by_id = {int(recipe_id): i for i, recipe_id in enumerate(self.ids)}
+        return self._position_by_id.get(int(recipe_id))
+
+    def _candidates(self, signature):
+        keys = _band_keys(signature[None, :])[:, 0]
+        candidates = []
+        for band, key in enumerate(keys):
+            row = self.band_keys[band]
+            lo = np.searchsorted(row, key, side="left")
+            hi = np.searchsorted(row, key, side="right")
+            candidates.append(self.band_positions[band, lo:hi])
+        return np.unique(np.concatenate(candidates)) if candidates else np.array([], dtype=np.int32)
+
+    def query_signature(self, signature, k=10, exclude=None, min_similarity=0.0):
+        """(positions, similarités estimées) des `k` plus proches voisins"""
+        candidates = self._candidates(signature)
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        if len(candidates) == 0:
+            return candidates, np.array([])
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        best = np.argsort(-similarity, kind="stable")[:k]
+        return candidates[best], similarity[best]
+
+    def similar(self, recipe_id, k=10, min_similarity=0.0):
+        """[(recipe_id, similarité)] des recettes aux ingrédients les plus proches"""
+        position = self.position(recipe_id)
+        if position is None:
+            return []
+        positions, similarity = self.query_signature(
+            np.asarray(self.signatures[position]), k, exclude=position, min_similarity=min_similarity
+        )
+        return [(int(self.ids[p]), float(s)) for p, s in zip(positions, similarity)]
+
+    def similar_to_ingredients(self, ingredients, k=10):
+        """Recettes proches d'un ensemble d'ingrédients libre (ex. contenu du frigo)"""
+        signature = minhash([{i.strip().lower() for i in ingredients}])[0]
+        positions, similarity = self.query_signature(signature, k)
+        return [(int(self.ids[p]), float(s)) for p, s in zip(positions, similarity)]
+
+    def near_duplicates(self, threshold=0.9, max_bucket=200):
+        """
+        Paires (id_a, id_b, similarité) de recettes quasi identiques, trouvées dans
+        les buckets LSH (les buckets de plus de `max_bucket` recettes sont ignorés).
+        """
+        pairs = {}
+        for band in range(self.band_keys.shape[0]):
+            keys = np.asarray(self.band_keys[band])
+            boundaries = np.flatnonzero(np.diff(keys)) + 1
+            starts = np.concatenate([[0], boundaries])
+            ends = np.concatenate([boundaries, [len(keys)]])
+            for start in np.flatnonzero((ends - starts > 1) & (ends - starts <= max_bucket)):
+                bucket = np.sort(np.asarray(self.band_positions[band, starts[start]:ends[start]]))
+                sig = np.asarray(self.signatures[bucket])
+                similarity = (sig[:, None, :] == sig[None, :, :]).mean(axis=2)
+                for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, k=1))):
+                    pairs[(int(bucket[i]), int(bucket[j]))] = float(similarity[i, j])
+        return sorted(
+            ((int(self.ids[a]), int(self.ids[b]), s) for (a, b), s in pairs.items()),
+            key=lambda pair: -pair[2],
+        )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else CATALOG_CSV
+        start = time.perf_counter()
+        n = build_index(csv_path)
+        print(f"Indexed {n} recipes into {INDEX_DIR} in {time.perf_counter() - start:.1f}s")
+    elif command == "duplicates":
+        threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.9
+        pairs = SimilarRecipeIndex().near_duplicates(threshold)
+        print(f"{len(pairs)} near-duplicate pairs (estimated Jaccard >= {threshold})")
+        for a, b, s in pairs[:50]:
+            print(f"{a}\t{b}\t{s:.2f}")
+    else:
+        print("usage: python helpers/similar_recipes.py [build [csv] | duplicates [threshold]]")
@@ -1,17 +1,24 @@
 import sys
 import os
+import hashlib
 from uuid import uuid4               # ▶️ added
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # ── helpers ──────────────────────────────────────────────────────────────────
-from helpers.database import get_user, add_pdv, get_calories
-from helpers.recipe_recommandation import propose_recipes, get_food_image_url
-from helpers.food_detection import analyse_frigo                     # YOLO
+from helpers.database import get_user, add_pdv, get_calories, get_pdv, data_version
+from helpers.recipe_recommandation import (
+    find_recipes, recommend_for_budget, similar_recipes, plan_meals, recipes_by_ids, recipe_ingredients,
+    get_food_image_url, current_snapshot,
+)
+from helpers.catalog import recipe_text
+from helpers.fridge import get_fridge, set_fridge, get_cookable_now, recommendations_version
+from helpers.budget_ranker import remaining_budget
+from helpers import recipes_db
 
 import streamlit as st
 import pandas as pd
 from PIL import Image
-from datetime import datetime
+from datetime import datetime, date
 
 from pathlib import Path   # déjà utilisé dans analyse_frigo, on le ré-importe ici
 
@@ -19,16 +26,6 @@ SAMPLE_IMAGE_PATH = Path(
     r"data\fridge_images\input\DSC_6074_JPG_jpg.rf.bad4341bdd01860ddc8744c67c504699.jpg"
 )
 
-# ── data cache ───────────────────────────────────────────────────────────────
-@st.cache_data
-def load_food_data():
-    return pd.read_csv(
-        "data/processed_recipes_with_categories.csv.gz",
-        compression="gzip"
-    )
-
-food_data = load_food_data()
-
 # ── utilities ────────────────────────────────────────────────────────────────
 def calculate_bmr(weight, height, age, gender):
     """Basal Metabolic Rate (Mifflin-St Jeor)."""
@@ -55,20 +52,16 @@ def get_daily_calories_from_garmin(user_id):
     return get_calories(user_id)
 
 
-# ── main app ─────────────────────────────────────────────────────────────────
-def show():
-    st.title("Show me the Food! I'll tell you what to eat 🍔🥗")
-
-    # --- User ----------------------------------------------------------------
-    username = st.session_state.get("user")
-    if not username:
-        st.warning("You must be logged in to access this page.")
-        return
-
-    user = get_user(username)
-    if not user:
-        st.error("User not found in database.")
-        return
+def nutrition_needs(user):
+    """
+    (bmr, calories brûlées aujourd'hui, tdee), gardés en session tant que les données
+    de l'utilisateur (version incrémentée à chaque écriture) et la date n'ont pas changé.
+    """
+    username = user[1]
+    key = (username, data_version(username), date.today())
+    cached = st.session_state.get("nutrition_needs")
+    if cached is not None and cached[0] == key:
+        return cached[1]
 
     weight = user[4] if user[4] else 70.0
     height = user[5] if user[5] else 175.0
@@ -83,7 +76,63 @@ def show():
         age = 30
     gender = user[6]
 
-    # ── Fridge Scanner ──────────────────────────────────────────────────────────
+    bmr = calculate_bmr(weight, height, age, gender)
+    daily_cals = get_daily_calories_from_garmin(user[0])
+    daily_burn = daily_cals[0] if daily_cals else 0
+    needs = (bmr, daily_burn, bmr + daily_burn)
+    st.session_state["nutrition_needs"] = (key, needs)
+    return needs
+
+
+# ── page sections ────────────────────────────────────────────────────────────
+# Chaque section est un fragment : un clic dans une section ne réexécute qu'elle.
+# Les sections échangent leurs valeurs par st.session_state (ingrédients choisis,
+# filtres), lues au moment où la section qui en a besoin s'exécute.
+INGREDIENT_OPTIONS = [
+    "apple", "banana", "beef", "blueberries", "bread", "butter", "carrot",
+    "cheese", "chicken", "chicken_breast", "chocolate", "corn", "eggs",
+    "flour", "goat_cheese", "green_beans", "ground_beef", "ham", "heavy_cream",
+    "lime", "milk", "mushrooms", "onion", "potato", "shrimp", "spinach",
+    "strawberries", "sugar", "sweet_potato", "tomato"
+]
+GRADE_EMOJIS = {"A": "🟢 A", "B": "🟡 B", "C": "🟠 C", "D": "🟣 D", "E": "🔴 E"}
+
+
+def scan_image(user_id, image_bytes, caption, image_path=None):
+    """
+    Détection YOLO d'une photo du frigo, une seule fois par image (clé : hash du contenu) :
+    les reruns suivants réaffichent le résultat sans relancer YOLO ni réécrire le frigo.
+    Renvoie la liste d'ingrédients détectés.
+    """
+    digest = hashlib.sha1(image_bytes).hexdigest()
+    scan = st.session_state.get("fridge_scan")
+    if scan is None or scan["hash"] != digest:
+        from helpers.food_detection import analyse_frigo  # YOLO (ultralytics/torch) : chargé au premier scan
+        if image_path is None:
+            image_path = os.path.join("data", "fridge_images", f"{datetime.now():%Y%m%d_%H%M%S}_{uuid4().hex[:6]}.jpg")
+            with open(image_path, "wb") as f:
+                f.write(image_bytes)
+        ingredients, annotated_path = analyse_frigo(image_path)
+        scan = {"hash": digest, "ingredients": ingredients, "annotated": annotated_path}
+        st.session_state["fridge_scan"] = scan
+        st.session_state["detected_ingredients"] = ingredients
+        # nouvelle photo : elle décrit tout le frigo et devient la sélection courante
+        st.session_state["fridge_selection"] = [ing for ing in dict.fromkeys(ingredients) if ing in INGREDIENT_OPTIONS]
+        set_fridge(user_id, ingredients, source="yolo")  # recalcul des recommandations en arrière-plan
+
+    st.image(scan["annotated"], caption=caption, use_container_width=True)
+    st.write("Detected ingredients:", scan["ingredients"])
+    return scan["ingredients"]
+
+
+def save_selection(user_id):
+    """on_change du multiselect : seule une édition manuelle réécrit le frigo"""
+    set_fridge(user_id, st.session_state["fridge_selection"], source="manual")
+
+
+@st.fragment
+def fridge_scanner(user_id):
+    """Scanner (caméra, upload, photo d'exemple) et choix des ingrédients"""
     st.header("Fridge Scanner")
 
     if "camera_active" not in st.session_state:
@@ -92,19 +141,13 @@ def show():
     if st.button("Activate/Deactivate Camera"):
         st.session_state.camera_active = not st.session_state.camera_active
 
-    detected_ingredients: list[str] = []      # will be filled below
-    detected_ingredients = st.session_state.get("detected_ingredients", [])
-
-    # --------------------------------------------------------------------------- #
-    # Helper: run YOLO + show (annotated if present, raw fallback)
-    # --------------------------------------------------------------------------- #
-    def process_and_show(image_path: str, caption: str) -> list[str]:
-        """Run YOLO, affiche l'image annotée et renvoie la liste d'ingrédients."""
-        ingredients, annotated_path = analyse_frigo(image_path)
-
-        st.image(annotated_path, caption=caption, use_container_width=True)
-        st.write("Detected ingredients:", ingredients)
-        return ingredients
+    # inventaire persistant : on repart du frigo enregistré si rien n'a été scanné dans la session
+    if "detected_ingredients" not in st.session_state:
+        st.session_state["detected_ingredients"] = list(get_fridge(user_id))
+    if "fridge_selection" not in st.session_state:
+        st.session_state["fridge_selection"] = [
+            ing for ing in dict.fromkeys(st.session_state["detected_ingredients"]) if ing in INGREDIENT_OPTIONS
+        ]
 
     # ── Webcam capture ─────────────────────────────────────────────────────────-
     if st.session_state.camera_active:
@@ -114,14 +157,7 @@ def show():
             st.info("📸 Click **Capture** to take a snapshot.")
             st.stop()
 
-        unique_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid4().hex[:6]}"
-        temp_path = os.path.join("data", "fridge_images", f"{unique_id}.jpg")
-
-        with open(temp_path, "wb") as f:
-            f.write(camera_image.getbuffer())
-
-        detected_ingredients = process_and_show(temp_path, "Annotated Fridge Image")
-        st.session_state["detected_ingredients"] = detected_ingredients 
+        scan_image(user_id, camera_image.getvalue(), "Annotated Fridge Image")
     else:
         st.write("Camera is deactivated. Click **Activate Camera** to start capturing.")
 
@@ -131,55 +167,34 @@ def show():
         "Or upload an image of your fridge", type=["jpg", "png", "jpeg"]
     )
     if uploaded_image is not None:
-        unique_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid4().hex[:6]}"
-        upload_path = os.path.join("data", "fridge_images", f"{unique_id}.jpg")
-
-        with open(upload_path, "wb") as f:
-            f.write(uploaded_image.getbuffer())
+        scan_image(user_id, uploaded_image.getvalue(), "Annotated Fridge Image (Uploaded)")
 
-        detected_ingredients = process_and_show(
-            upload_path, "Annotated Fridge Image (Uploaded)"
-        )
-        st.session_state["detected_ingredients"] = detected_ingredients
-        
     # ── Sample image option ─────────────────────────────────────────────────────
     elif st.button("Use sample fridge photo 🖼️"):
         if SAMPLE_IMAGE_PATH.exists():
-            detected_ingredients = process_and_show(
-                str(SAMPLE_IMAGE_PATH), "Annotated Fridge Image (Sample)"
-            )
-            st.session_state["detected_ingredients"] = detected_ingredients
+            scan_image(user_id, SAMPLE_IMAGE_PATH.read_bytes(), "Annotated Fridge Image (Sample)",
+                       image_path=str(SAMPLE_IMAGE_PATH))
         else:
             st.error("⚠️ Sample image not found — check the path.")
 
     # --- Ingredient Selection -------------------------------------------------
-    ingredient_options = [
-        "apple", "banana", "beef", "blueberries", "bread", "butter", "carrot",
-        "cheese", "chicken", "chicken_breast", "chocolate", "corn", "eggs",
-        "flour", "goat_cheese", "green_beans", "ground_beef", "ham", "heavy_cream",
-        "lime", "milk", "mushrooms", "onion", "potato", "shrimp", "spinach",
-        "strawberries", "sugar", "sweet_potato", "tomato"
-    ]
-
     default_selection = [
-        ing for ing in detected_ingredients if ing in ingredient_options
+        ing for ing in dict.fromkeys(st.session_state["detected_ingredients"]) if ing in INGREDIENT_OPTIONS
     ]
 
     manual_selection = st.multiselect(
         "Select ingredients",
-        ingredient_options,
-        default=default_selection,
+        INGREDIENT_OPTIONS,
+        key="fridge_selection",
+        on_change=save_selection,
+        args=(user_id,),
     )
-    selected_ingredients = manual_selection or default_selection
+    st.session_state["selected_ingredients"] = manual_selection or default_selection
 
-    # --- Nutritional calculations --------------------------------------------
-    st.header("Nutritional Needs")
 
-    bmr = calculate_bmr(weight, height, age, gender)
-    user_id = user[0]                          # database PK
-    daily_cals = get_daily_calories_from_garmin(user_id)
-    daily_burn = daily_cals[0] if daily_cals else 0
-    tdee = bmr + daily_burn
+@st.fragment
+def nutrition_overview(bmr, daily_burn, tdee):
+    st.header("Nutritional Needs")
 
     nutri_df = pd.DataFrame(
         {
@@ -206,88 +221,223 @@ def show():
     )
     st.markdown(f"⬇️ Lose Weight  <  {tdee:.0f} cal/day  <  ⬆️ Gain Weight")
 
-    # --- Recipe recommendations ----------------------------------------------
+
+@st.fragment
+def recipe_card(recipe, description, user_id):
+    """Carte d'une recette : « Save » ne réexécute que cette carte (et l'insert pdv)"""
+    col1, col2 = st.columns([2, 1])
+    grade = recipe["grade"]
+
+    # ── left column: image + facts ─────────────────────────────────
+    with col1:
+        st.write(f"🍽️ **{recipe['name']} {GRADE_EMOJIS[grade]}**")
+        img_url = get_food_image_url(recipe["id"])
+        if img_url:
+            recipe_url = (
+                "https://www.food.com/recipe/"
+                f"{recipe['name'].lower().replace(' ', '-')}-{recipe['id']}"
+            )
+            st.markdown(
+                f'<a href="{recipe_url}" target="_blank">'
+                f'<img src="{img_url}" alt="{recipe["name"]}" style="width:100%;"></a>',
+                unsafe_allow_html=True,
+            )
+        else:
+            st.write("No image available.")
+
+        st.write(f"⏳ **Cooking time**: {recipe['minutes']} minutes")
+        if description:  # None : pas de description, ou fichier texte non écrit pour ce catalogue
+            st.write(f"📜 **Author’s description:** {description}")
+
+        # PDVs
+        pdv_df = pd.DataFrame(
+            {
+                "Calories": [int(recipe["calories"])],
+                "Fat PDV": [f"{recipe['total_fat_PDV']:.2f}%"],
+                "Sugar PDV": [f"{recipe['sugar_PDV']:.2f}%"],
+                "Sodium PDV": [f"{recipe['sodium_PDV']:.2f}%"],
+                "Protein PDV": [f"{recipe['protein_PDV']:.2f}%"],
+                "Sat. Fat PDV": [f"{recipe['saturated_fat_PDV']:.2f}%"],
+                "Carbs PDV": [f"{recipe['carbohydrates_PDV']:.2f}%"],
+            }
+        )
+        st.table(pdv_df)
+
+    # ── right column: ingredients + save button ────────────────────
+    with col2:
+        st.write("🛒 **Ingredients:**")
+        for ingredient in recipe_ingredients(recipe["id"]):
+            st.write(f"- {ingredient}")
+
+        if st.button(f"Save {recipe['name']}", key=f"save_{recipe['id']}"):
+            add_pdv(
+                user_id=user_id,
+                calories=recipe["calories"],
+                total_fat_PDV=recipe.get("total_fat_PDV"),
+                sugar_PDV=recipe.get("sugar_PDV"),
+                sodium_PDV=recipe.get("sodium_PDV"),
+                protein_PDV=recipe.get("protein_PDV"),
+                saturated_fat_PDV=recipe.get("saturated_fat_PDV"),
+                carbohydrates_PDV=recipe.get("carbohydrates_PDV"),
+            )
+            st.success(f"Recipe **{recipe['name']}** added to your plan!")
+
+        if st.button("More like this", key=f"similar_{recipe['id']}"):
+            similar = similar_recipes(recipe["id"], k=5)
+            if similar.empty:
+                st.info("No similar recipes found.")
+            else:
+                st.session_state.matching_recipes = similar
+                st.session_state.cookable_version = None
+                st.rerun()
+
+
+@st.fragment
+def recipe_recommendations(user_id, tdee):
+    """Filtres, recherche et liste des recettes proposées"""
     st.header("Recipes Recommandations")
 
-    if "matching_recipes" not in st.session_state:
-        st.session_state.matching_recipes = pd.DataFrame()
+    # recommandations "cuisinables maintenant" précalculées au dernier changement du frigo,
+    # relues quand un recalcul se termine ; cookable_version vaut None quand la liste
+    # affichée vient d'une recherche (elle n'est alors pas remplacée)
+    # recipes.db (SQL, FTS) seulement s'il contient la version du catalogue servie
+    snapshot = current_snapshot()
+    use_db = recipes_db.serves_version(snapshot.version)
+
+    version = recommendations_version(user_id)
+    shown = st.session_state.get("cookable_version")
+    if "matching_recipes" not in st.session_state or (shown is not None and shown != version):
+        st.session_state.matching_recipes = recipes_by_ids(get_cookable_now(user_id))
+        st.session_state.cookable_version = version
+    if st.session_state.get("cookable_version") is not None and not st.session_state.matching_recipes.empty:
+        st.write("🧊 Cookable now with what's in your fridge:")
+
+    grade_col, minutes_col, calories_col = st.columns(3)
+    with grade_col:
+        filter_grades = st.multiselect("Nutri-Score grades", ["A", "B", "C", "D", "E"], key="filter_grades")
+    with minutes_col:
+        max_minutes = st.selectbox("Max cooking time (min)", [None, 15, 30, 45, 60, 120],
+                                   format_func=lambda v: "Any" if v is None else str(v), key="max_minutes")
+    with calories_col:
+        max_calories = st.selectbox("Max calories", [None, 300, 400, 600, 800, 1000],
+                                    format_func=lambda v: "Any" if v is None else str(v))
+
+    rank_by_budget = st.checkbox(
+        "Rank by what fits my remaining daily budget", value=True,
+        help="TDEE minus today's logged calories, 100% minus today's logged PDVs",
+    )
 
+    selected_ingredients = st.session_state.get("selected_ingredients", [])
     if st.button("Find Recipes"):
         if selected_ingredients:
-            matches = propose_recipes(selected_ingredients)
+            if rank_by_budget:
+                budget = remaining_budget(tdee, get_pdv(user_id, since=date.today()))
+                matches = recommend_for_budget(
+                    budget, selected_ingredients, grades=filter_grades, max_minutes=max_minutes,
+                    max_calories=max_calories, limit=10,
+                )
+            # recipes.db chargé (python -m helpers.recipes_db) -> requête SQL indexée,
+            # sinon index bitmap sur le catalogue en mémoire
+            elif use_db:
+                matches = recipes_db.propose_recipes(
+                    selected_ingredients, limit=10,
+                    filters={"grades": filter_grades, "max_minutes": max_minutes, "max_calories": max_calories},
+                )
+            else:
+                matches = find_recipes(
+                    selected_ingredients, grades=filter_grades, max_minutes=max_minutes,
+                    max_calories=max_calories, limit=10,
+                )
             if not matches.empty:
                 st.session_state.matching_recipes = matches.head(10)
+                st.session_state.cookable_version = None
                 st.write(
                     f"Found a top-{len(st.session_state.matching_recipes)} matching recipes!"
                 )
         else:
             st.warning("Please select at least one ingredient.")
 
-    if not st.session_state.matching_recipes.empty:
-        grade_emojis = {"A": "🟢 A", "B": "🟡 B", "C": "🟠 C", "D": "🟣 D", "E": "🔴 E"}
+    # --- Free-text search (index FTS5 de recipes.db) ---------------------------
+    if use_db:
+        search_col, grade_col = st.columns([3, 1])
+        with search_col:
+            search_query = st.text_input(
+                "Or search recipes by name, description or ingredient",
+                placeholder='e.g. chick* "olive oil"',
+            )
+        with grade_col:
+            search_grades = st.multiselect("Grades", ["A", "B", "C", "D", "E"])
+        if st.button("Search") and search_query:
+            matches = recipes_db.search_recipes(
+                search_query, {"grades": search_grades}, limit=10
+            )
+            if matches.empty:
+                st.warning("No recipe matches your search.")
+            else:
+                st.session_state.matching_recipes = matches
+                st.session_state.cookable_version = None
 
+    if not st.session_state.matching_recipes.empty:
+        descriptions = recipe_text(st.session_state.matching_recipes["id"], paths=snapshot.paths)
         for _, recipe in st.session_state.matching_recipes.iterrows():
-            col1, col2 = st.columns([2, 1])
-            grade = recipe["grade"]
-
-            # ── left column: image + facts ─────────────────────────────────
-            with col1:
-                st.write(f"🍽️ **{recipe['name']} {grade_emojis[grade]}**")
-                img_url = get_food_image_url(recipe["id"])
-                if img_url:
-                    recipe_url = (
-                        "https://www.food.com/recipe/"
-                        f"{recipe['name'].lower().replace(' ', '-')}-{recipe['id']}"
-                    )
-                    st.markdown(
-                        f'<a href="{recipe_url}" target="_blank">'
-                        f'<img src="{img_url}" alt="{recipe["name"]}" style="width:100%;"></a>',
-                        unsafe_allow_html=True,
-                    )
-                else:
-                    st.write("No image available.")
-
-                st.write(f"⏳ **Cooking time**: {recipe['minutes']} minutes")
-                st.write(f"📜 **Author’s description:** {recipe['description']}")
-
-                # PDVs
-                pdv_df = pd.DataFrame(
-                    {
-                        "Calories": [int(recipe["calories"])],
-                        "Fat PDV": [f"{recipe['total_fat_PDV']:.2f}%"],
-                        "Sugar PDV": [f"{recipe['sugar_PDV']:.2f}%"],
-                        "Sodium PDV": [f"{recipe['sodium_PDV']:.2f}%"],
-                        "Protein PDV": [f"{recipe['protein_PDV']:.2f}%"],
-                        "Sat. Fat PDV": [f"{recipe['saturated_fat_PDV']:.2f}%"],
-                        "Carbs PDV": [f"{recipe['carbohydrates_PDV']:.2f}%"],
-                    }
-                )
-                st.table(pdv_df)
-
-            # ── right column: ingredients + save button ────────────────────
-            with col2:
-                st.write("🛒 **Ingredients:**")
-                for raw_ing in recipe["ingredients_list"].split(", "):
-                    clean_ing = raw_ing.strip('"[] ').strip("'")
-                    st.write(f"- {clean_ing}")
-
-                if st.button(f"Save {recipe['name']}"):
-                    add_pdv(
-                        user_id=user_id,
-                        calories=recipe["calories"],
-                        total_fat_PDV=recipe.get("total_fat_PDV"),
-                        sugar_PDV=recipe.get("sugar_PDV"),
-                        sodium_PDV=recipe.get("sodium_PDV"),
-                        protein_PDV=recipe.get("protein_PDV"),
-                        saturated_fat_PDV=recipe.get("saturated_fat_PDV"),
-                        carbohydrates_PDV=recipe.get("carbohydrates_PDV"),
-                    )
-                    st.success(f"Recipe **{recipe['name']}** added to your plan!")
-
+            recipe_card(recipe, descriptions.get(int(recipe['id'])), user_id)
     else:
         st.write("No recipes found yet. Click **Find Recipes** to discover delicious meals!")
 
 
+@st.fragment
+def meal_plan(tdee):
+    st.header("Weekly Meal Plan")
+    plan_days = st.slider("Number of days", min_value=1, max_value=14, value=7)
+    if st.button("Plan my meals"):
+        try:
+            plan = plan_meals(
+                tdee, fridge_ingredients=st.session_state.get("selected_ingredients", []), days=plan_days,
+                grades=st.session_state.get("filter_grades"), max_minutes=st.session_state.get("max_minutes"),
+            )
+        except ValueError as e:
+            st.warning(f"Couldn't build a meal plan: {e}. Try relaxing the grade or cooking-time filters.")
+        else:
+            if plan["day"].max() < plan_days:
+                st.info(f"Only enough matching recipes for {plan['day'].max()} day(s) without repeats.")
+            st.session_state["meal_plan"] = plan
+
+    if "meal_plan" in st.session_state:
+        plan = st.session_state["meal_plan"]
+        st.dataframe(
+            plan[["day", "meal", "name", "grade", "minutes", "calories"]],
+            hide_index=True, use_container_width=True,
+        )
+        daily = plan.groupby("day")[["calories", "total_fat_PDV", "sugar_PDV", "sodium_PDV",
+                                     "protein_PDV", "saturated_fat_PDV", "carbohydrates_PDV"]].sum()
+        st.markdown(f"Daily totals (target: {tdee:.0f} cal/day, PDVs under 100% when possible)")
+        st.dataframe(daily.round(0), use_container_width=True)
+
+
+# ── main app ─────────────────────────────────────────────────────────────────
+def show():
+    st.title("Show me the Food! I'll tell you what to eat 🍔🥗")
+
+    # --- User ----------------------------------------------------------------
+    username = st.session_state.get("user")
+    if not username:
+        st.warning("You must be logged in to access this page.")
+        return
+
+    user = get_user(username)
+    if not user:
+        st.error("User not found in database.")
+        return
+
+    user_id = user[0]                          # database PK
+    bmr, daily_burn, tdee = nutrition_needs(user)
+
+    fridge_scanner(user_id)
+    nutrition_overview(bmr, daily_burn, tdee)
+    recipe_recommendations(user_id, tdee)
+    meal_plan(tdee)
+
+
 # ── run module directly ──────────────────────────────────────────────────────
 if __name__ == "__main__":
     show()
@@ -1,9 +1,13 @@
 import streamlit as st
 import openai
-import sqlite3
+import sys
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from helpers.database import get_user, get_recent_activities, data_version
+from helpers.chat_history import CHAT_MODEL, build_messages, fold_point, message_tokens, summarize
+from helpers.metrics import count, span
 
 
 # Charger les variables d'environnement
@@ -13,18 +17,12 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 
-DB_FILE = "data/users.db"
-
 def get_user_info(username):
     """Récupère les infos de l'utilisateur depuis la base de données."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT birth_date, weight, height, gender FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = get_user(username)
 
     if user:
-        birth_date, weight, height, gender = user
+        birth_date, weight, height, gender = user[3:7]
         age = None
 
         if birth_date and isinstance(birth_date, str):
@@ -45,51 +43,33 @@ def get_user_info(username):
 
 def get_last_activities(username):
     """Récupère les 5 dernières activités de l'utilisateur."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    SELECT activity_name, start_time, calories, steps 
-    FROM activities 
-    JOIN users ON activities.user_id = users.id 
-    WHERE users.username = ?
-    ORDER BY start_time DESC
-    LIMIT 5
-    """, (username,))
-
-    activities = cursor.fetchall()
-    conn.close()
+    activities = get_recent_activities(username, limit=5)
 
     if activities:
         formatted_activities = "\n".join([
-            f"- {activity[0]} on {activity[1]}: {activity[2]} calories, {activity[3]} steps"
+            f"- {activity[0]} on {activity[1]}: {activity[2]} calories, {activity[4]} steps"
             for activity in activities
         ])
         return f"The user has recently performed the following activities:\n{formatted_activities}"
     return "The user has no recorded activities."
 
-def show():
-    # Configuration de l'API OpenAI
-    client = openai.Client(api_key=OPENAI_API_KEY)
-    
-    st.title("🥗 Your Personal Coach 🤖")
+@st.cache_resource
+def get_client():
+    """Client OpenAI partagé (OPENAI_BASE_URL permet de viser un serveur compatible local)"""
+    return openai.Client(api_key=OPENAI_API_KEY)
+
+def get_user_context(username):
+    """
+    Contexte utilisateur du message système, gardé en session tant que les données de
+    l'utilisateur (profil, activités) n'ont pas changé.
+    """
+    key = (username, data_version(username))
+    cached = st.session_state.get("user_context_key")
+    if cached == key:
+        return st.session_state["user_context"]
 
-    # Initialisation de l'historique des messages
-    if "messages" not in st.session_state:
-        st.session_state["messages"] = []
-
-    # Initialisation de la session utilisateur
-    if "user_context" not in st.session_state:
-        st.session_state["user_context"] = ""
-
-    if "first_interaction" not in st.session_state:
-        st.session_state["first_interaction"] = True
-
-    # Récupération des infos utilisateur
-    username = st.session_state.get("user", "guest")
     user_info = get_user_info(username)
-    activities_info = get_last_activities(username)
-
+    user_context = ""
     if user_info:
         user_context = f"""
         The user has provided the following personal details:
@@ -98,12 +78,50 @@ def show():
         - Height: {user_info['height']} cm
         - Gender: {user_info['gender']}
 
-        {activities_info}
+        {get_last_activities(username)}
 
         Remember these details and use them for personalized recommendations.
         If the user asks for their information later, remind them of what they provided.
         """
-        st.session_state["user_context"] = user_context
+    st.session_state["user_context"] = user_context
+    st.session_state["user_context_key"] = key
+    return user_context
+
+def fold_old_messages(client):
+    """
+    Résume les plus anciens messages quand l'historique dépasse le budget (voir
+    `fold_point`). Appelé après l'affichage de la réponse : le résumé ne retarde jamais
+    le premier token.
+    """
+    messages = st.session_state["messages"]
+    start = fold_point(messages)
+    if start == 0:
+        return
+    try:
+        with span("chat.summarize"):
+            st.session_state["chat_summary"] = summarize(client, st.session_state["chat_summary"], messages[:start])
+    except openai.OpenAIError:
+        return  # on réessaiera au prochain message
+    del messages[:start]
+
+def show():
+    # Configuration de l'API OpenAI
+    client = get_client()
+    
+    st.title("🥗 Your Personal Coach 🤖")
+
+    # Initialisation de l'historique des messages (les plus anciens sont résumés dans chat_summary)
+    if "messages" not in st.session_state:
+        st.session_state["messages"] = []
+    if "chat_summary" not in st.session_state:
+        st.session_state["chat_summary"] = ""
+
+    if "first_interaction" not in st.session_state:
+        st.session_state["first_interaction"] = True
+
+    # Récupération des infos utilisateur (en cache jusqu'à la prochaine écriture)
+    username = st.session_state.get("user", "guest")
+    user_context = get_user_context(username)
 
     # Questions préenregistrées
     predefined_questions = [
@@ -140,18 +158,21 @@ def show():
         # Définition du contexte système avec mémorisation des infos utilisateur
         system_context = f"""
         You are a helpful assistant specialized in nutrition and fitness.
-        {st.session_state.get('user_context', 'User details are unknown.')}
+        {user_context or 'User details are unknown.'}
         Always use the provided information to give personalized responses.
         """
-
-        # Génération de la réponse du chatbot
-        with st.chat_message("assistant"):
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "system", "content": system_context}] + st.session_state["messages"]
-            )
-            message = response.choices[0].message.content
-            st.markdown(message)
+        messages = build_messages(
+            system_context,
+            st.session_state["messages"],
+            st.session_state["chat_summary"],
+        )
+        count("chat_payload_tokens", sum(message_tokens(message) for message in messages))
+
+        # Génération de la réponse du chatbot, affichée au fil des tokens
+        with st.chat_message("assistant"), span("chat.completion"):
+            stream = client.chat.completions.create(model=CHAT_MODEL, messages=messages, stream=True)
+            message = st.write_stream(stream)
         
         # Ajout de la réponse du chatbot à l'historique
-        st.session_state["messages"].append({"role": "assistant", "content": message})
\ No newline at end of file
+        st.session_state["messages"].append({"role": "assistant", "content": message})
+        fold_old_messages(client)
@@ -5,13 +5,40 @@ from datetime import datetime, timedelta
 import plotly.express as px
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import helper functions from our CSV-based recommendation module.
-from helpers.database import get_user, get_poids, get_activities, get_pdv
+from helpers.database import data_version, get_dashboard_data
+from helpers.downsample import downsample
 
 import pandas as pd
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
+# Fenêtres d'historique proposées pour les graphiques (jours, None = tout) : seule la
+# fenêtre choisie est chargée, et les buckets (jour/semaine/mois) suivent sa durée
+HISTORY_RANGES = {"3 months": 91, "1 year": 365, "3 years": 3 * 365, "All": None}
+DEFAULT_HISTORY = "1 year"
+ACTIVITY_COLUMNS = ["Activity", "Start Time", "Calories", "BMR Calories", "Steps"]
+
+
+def load_dashboard_data(username, history_start):
+    """
+    Données du tableau de bord, lues une fois (une connexion) puis gardées en session :
+    les reruns dus aux widgets ne refont aucune requête tant que la version des
+    données de l'utilisateur (incrémentée à chaque écriture) n'a pas changé.
+    """
+    key = (username, data_version(username), history_start)
+    cached = st.session_state.get("dashboard_data")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    data = get_dashboard_data(username, since=history_start)
+    if data is not None:
+        # DataFrame des activités construit une seule fois pour tous les graphiques
+        df_activities = pd.DataFrame(data["activities"], columns=ACTIVITY_COLUMNS)
+        df_activities["Start Time"] = pd.to_datetime(df_activities["Start Time"], errors='coerce')
+        data["activities_df"] = df_activities
+    st.session_state["dashboard_data"] = (key, data)
+    return data
+
 
 def show():
 
@@ -38,16 +65,23 @@ def show():
     )
         
     username = st.session_state['user']
-    user_info = get_user(username)
+    history = st.selectbox("History", list(HISTORY_RANGES), index=list(HISTORY_RANGES).index(DEFAULT_HISTORY),
+                           key="dashboard_history")
+    history_days = HISTORY_RANGES[history]
+    history_start = None if history_days is None else (datetime.today() - timedelta(days=history_days)).date()
+    # Plage affichée : fixe la taille des buckets et l'axe des dates des courbes
+    period = (history_start, datetime.today().date())
+    data = load_dashboard_data(username, history_start)
     
-    if not user_info:
+    if not data:
         st.write('User not found.')
         return
 
-    user_id = user_info[0]  # Replace with actual user ID fetching logic
-    weight_data = get_poids(user_id)
-    activity_data = get_activities(username)  # Fetch activity data
-    pdv_data = get_pdv(user_id)  # Fetch PDV data for the user
+    user_info = data["user"]
+    # Dernière pesée connue en repli si aucune dans la fenêtre
+    weight_data = data["weight"]
+    activity_data = data["activities"]  # Fetch activity data
+    pdv_data = data["pdv"]  # Fetch PDV data for the user
     
     if not weight_data or not user_info:
         st.write("No weight data available.")
@@ -150,19 +184,20 @@ def show():
             if not pdv_df.empty:
                 fig4 = go.Figure()
 
-                # Plot each PDV variable
+                # Plot each PDV variable (daily totals, bucketed and capped in points)
                 for pdv_variable in pdv_max_values.keys():
+                    series = downsample(pdv_df['Date'], pdv_df[pdv_variable], how="daily", period=period)
                     fig4.add_trace(go.Scatter(
-                        x=pdv_df['Date'],
-                        y=pdv_df[pdv_variable],
+                        x=series.index,
+                        y=series.values,
                         mode='lines+markers',
                         name=pdv_variable.replace('_', ' ').title()
                     ))
 
                 # Horizontal line at 100 to represent the goal
                 fig4.add_trace(go.Scatter(
-                    x=pdv_df['Date'],
-                    y=[100] * len(pdv_df),
+                    x=[pdv_df['Date'].min(), pdv_df['Date'].max()],
+                    y=[100, 100],
                     mode='lines',
                     name="Goal (100%)",
                     line=dict(color='gray', dash='dash'),
@@ -189,27 +224,20 @@ def show():
     calorie_progress = total_calories_today / calorie_goal * 100
 
     col1, col2 = st.columns(2)
+    df_activities = data["activities_df"]
     with col1:
-        # Récupération des activités
-        username = st.session_state["user"]
-        activity_data = get_activities(username)
-
-        # Convertir les données en DataFrame
-        df_activities = pd.DataFrame(activity_data, columns=["Activity", "Start Time", "Calories", "BMR Calories", "Steps"])
-        df_activities["Start Time"] = pd.to_datetime(df_activities["Start Time"], errors='coerce')
-
         if df_activities.empty:
             st.write("No activity data available.")
         else:
-            # Grouper les calories brûlées par jour
-            df_activities["Date"] = df_activities["Start Time"].dt.date
-            daily_calories = df_activities.groupby("Date")["Calories"].sum().reset_index()
+            # Grouper les calories brûlées par jour (moyenne par semaine/mois sur un long historique)
+            daily_calories = downsample(df_activities["Start Time"], df_activities["Calories"], how="daily",
+                                        period=period)
 
             # Création du graphique avec Plotly
             fig1 = go.Figure()
             fig1.add_trace(go.Scatter(
-                x=daily_calories["Date"],
-                y=daily_calories["Calories"],
+                x=daily_calories.index,
+                y=daily_calories.values,
                 mode='lines+markers',
                 name="Calories Burned",
                 line=dict(color='orange')
@@ -217,8 +245,8 @@ def show():
 
             # Ajouter une ligne horizontale pour l'objectif journalier de 2000 calories
             fig1.add_trace(go.Scatter(
-                x=daily_calories["Date"],
-                y=[calorie_goal] * len(daily_calories),
+                x=[daily_calories.index.min(), daily_calories.index.max()],
+                y=[calorie_goal, calorie_goal],
                 mode='lines',
                 name=f"Goal ({calorie_goal} kcal)",
                 line=dict(color='gray', dash='dash'),
@@ -240,7 +268,9 @@ def show():
         # Weight and BMI data visualization using Plotly
         height_m = user_info[5] / 100  # Assuming height is at index 5 in user tuple, convert cm to meters
         df_weight = pd.DataFrame(weight_data, columns=["Weight", "Date"])
-        df_weight["Date"] = pd.to_datetime(df_weight["Date"])
+        # Pesées brutes, réduites par LTTB si l'historique est long
+        weights = downsample(df_weight["Date"], df_weight["Weight"])
+        df_weight = pd.DataFrame({"Date": weights.index, "Weight": weights.values})
         df_weight["BMI"] = df_weight["Weight"] / (height_m ** 2)
             
         fig2 = go.Figure()
@@ -274,14 +304,6 @@ def show():
 
         st.plotly_chart(fig2)
 
-    # Récupération des activités
-    username = st.session_state["user"]
-    activity_data = get_activities(username)
-
-    # Convertir les données en DataFrame
-    df_activities = pd.DataFrame(activity_data, columns=["Activity", "Start Time", "Calories", "BMR Calories", "Steps"])
-    df_activities["Start Time"] = pd.to_datetime(df_activities["Start Time"], errors='coerce')
-
     # Filtrer les activités depuis le début
     df_last_month = df_activities
 
@@ -1,15 +1,41 @@
 import streamlit as st
 st.set_page_config(layout="wide")
 import pandas as pd
+import importlib
 import sys
 import os
-import chat, informations, activite, alimentation, visu, dashboard
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from streamlit_option_menu import option_menu
-from helpers.database import init_db, register_user, get_user, verify_password,add_poids
+from helpers.database import init_db, register_user, get_user, authenticate, add_poids
+from helpers.fridge import init_fridge_db
+from helpers.metrics import count, span, start_exporter
 
-# Initialisation de la base de données SQLite
-init_db()
+@st.cache_resource
+def init_databases():
+    """Initialisation des bases SQLite, une seule fois par processus (pas à chaque rerun)"""
+    init_db()
+    init_fridge_db()
+
+init_databases()
+start_exporter()  # METRICS=prometheus|jsonl (sans effet par défaut)
+
+def load_page(name):
+    """
+    Importe le module d'une page à sa première ouverture : ses dépendances lourdes
+    (openai, plotly, matplotlib, catalogue de recettes...) ne retardent pas le
+    formulaire de connexion. Les ouvertures suivantes réutilisent sys.modules.
+    """
+    if name not in sys.modules:
+        with span("page.import", page=name):
+            return importlib.import_module(name)
+    return sys.modules[name]
+
+def show_page(name):
+    """Rendu d'une page, chronométré par page"""
+    module = load_page(name)
+    count("page_renders", page=name)
+    with span("page.render", page=name):
+        module.show()
 
 def login():
     """Affichage du formulaire de connexion"""
@@ -20,8 +46,8 @@ def login():
         username = st.text_input("Username", key="login_user")
         password = st.text_input("Password", type="password", key="login_pass")
         if st.button("Login", use_container_width=True):
-            user = get_user(username)
-            if user and verify_password(password, user[2]):  # user[2] = password_hash
+            user = authenticate(username, password)
+            if user:
                 st.session_state["authenticated"] = True
                 st.session_state["user"] = username
                 st.session_state["success_message"] = f"Welcome, {username}! 🎉"
@@ -102,14 +128,13 @@ if st.session_state["authenticated"]:
             logout()
 
     if page == "Dashboard":
-        dashboard.show()
+        show_page("dashboard")
     elif page == "Alimentation":
-        alimentation.show()
+        show_page("alimentation")
     elif page == "Personal Information":
-        informations.show()
+        show_page("informations")
     elif page == "Coach":
-        import chat
-        chat.show()
+        show_page("chat")
 else:
     st.markdown("""
         <style>
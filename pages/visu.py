@@ -1,35 +1,95 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import sys
+import os
+from datetime import timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from helpers.database import BROWSE_TABLES, browse_table, table_summary
+
+PAGE_SIZES = [25, 50, 100, 500]
+
+
+def pager(signature):
+    """
+    État de pagination de la vue courante : curseurs de début de chaque page déjà vue
+    (le premier est None) et page affichée ; remis à zéro si table, colonnes, filtres
+    ou tri changent.
+    """
+    state = st.session_state.get("visu_pager")
+    if state is None or state["signature"] != signature:
+        state = {"signature": signature, "cursors": [None], "page": 0}
+        st.session_state["visu_pager"] = state
+    return state
 
-DB_FILE = "data/users.db"
 
 def show():
     st.title("📊 View Database")
 
-    conn = sqlite3.connect(DB_FILE)
-    
-    # Affichage des utilisateurs
-    st.subheader("Users")
-    users = pd.read_sql_query("SELECT * FROM users", conn)
-    st.dataframe(users)
-
-    # Affichage des activités
-    st.subheader("Activities")
-    activities = pd.read_sql_query("SELECT * FROM activities", conn)
-    st.dataframe(activities)
-    
-    # Affichage des poids
-    st.subheader("Poids")
-    poids_data = pd.read_sql_query("SELECT * FROM poids", conn)
-    st.dataframe(poids_data)
-    
-    # Affichage des valeurs nutritionnelles
-    st.subheader("Valeurs Nutritionnelles")
-    pdv_data = pd.read_sql_query("SELECT * FROM pdv", conn)
-    st.dataframe(pdv_data)
-
-    conn.close()
+    table = st.selectbox("Table", list(BROWSE_TABLES))
+    spec = BROWSE_TABLES[table]
+
+    columns = st.multiselect("Columns", spec["columns"], default=spec["columns"], key=f"visu_columns_{table}")
+    if not columns:
+        st.warning("Select at least one column.")
+        return
+
+    # --- Filtres (appliqués en SQL) --------------------------------------------
+    filters = {}
+    filter_cols = st.columns(3)
+    with filter_cols[0]:
+        user_id = st.number_input("User id", min_value=0, value=0, step=1, help="0 = all users")
+        filters["user_id"] = int(user_id) or None
+    with filter_cols[1]:
+        if spec["search"] is not None:
+            filters["search"] = st.text_input(f"{spec['search']} contains").strip() or None
+    with filter_cols[2]:
+        if spec["date"] is not None:
+            period = st.date_input(f"{spec['date']} between", value=())
+            if len(period) == 2:
+                filters["since"], filters["until"] = period[0], period[1] + timedelta(days=1)
+
+    sort_cols = st.columns([2, 1, 1])
+    with sort_cols[0]:
+        order_by = st.selectbox("Sort by", spec["columns"])
+    with sort_cols[1]:
+        descending = st.checkbox("Descending", value=spec["date"] is not None)
+    with sort_cols[2]:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    # --- Résumé (COUNT/MIN/MAX, sans lire les lignes) ----------------------------
+    summary = table_summary(table, filters)
+    metric_cols = st.columns(4 if spec["date"] is not None else 2)
+    metric_cols[0].metric("Rows", summary["rows"])
+    metric_cols[1].metric("Users", summary["users"])
+    if spec["date"] is not None:
+        metric_cols[2].metric("First", summary["first"] or "-")
+        metric_cols[3].metric("Last", summary["last"] or "-")
+
+    # --- Page courante (keyset pagination) --------------------------------------
+    signature = (table, tuple(columns), tuple(sorted((k, str(v)) for k, v in filters.items())),
+                 order_by, descending, page_size)
+    state = pager(signature)
+    rows, names, next_cursor = browse_table(
+        table, columns, filters, order_by, descending, page_size, state["cursors"][state["page"]]
+    )
+    st.dataframe(pd.DataFrame(rows, columns=names), hide_index=True, use_container_width=True)
+
+    pages = max(1, -(-summary["rows"] // page_size))
+    nav_cols = st.columns([1, 1, 1, 3])
+    if nav_cols[0].button("⏮ First", disabled=state["page"] == 0):
+        state["page"] = 0
+        st.rerun()
+    if nav_cols[1].button("◀ Previous", disabled=state["page"] == 0):
+        state["page"] -= 1
+        st.rerun()
+    if nav_cols[2].button("Next ▶", disabled=next_cursor is None):
+        del state["cursors"][state["page"] + 1:]
+        state["cursors"].append(next_cursor)
+        state["page"] += 1
+        st.rerun()
+    nav_cols[3].write(f"Page {state['page'] + 1} / {pages}")
+
 
 if __name__ == "__main__":
-    show()
\ No newline at end of file
+    show()